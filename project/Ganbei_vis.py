@@ -26,26 +26,41 @@
 # =========================================================================
 
 import multiprocessing, termios
-import math, time, os, socket, sys, signal, cv2
-import numpy as np
+import math, time, os, sys, signal
 
 sys.path.append('/home/pi/Ganbei/scripts')
 from alia_vis import AliaVis
+from alia_proc import AliaProc
+from alia_log import AliaRec, SPIN, SPOUT
 from azure_reco import AzureReco
 from mpi_spout import MpiFace
 from mpi_hiwonder import MasterPi, PlaySFX, LowBatt       
+from mpi_sim import SimPi
 
 from mpi_shell import MpiShell
 from mpi_arm import MpiArm
 from mpi_base import MpiBase
+from mpi_imu import MpiImu
+from mpi_sonar import MpiSonar
+from mpi_guard import MpiGuard
 from mpi_cam import MpiCam
 from tof_cam import TofCam
+from img_viewer import ImgViewer
+from cam_watch import CamWatch
+from cycle_prof import CycleProf
+from rate_sched import RateSched
+from init_graph import InitGraph
 
 
 # -------------------------------------------------------------------------
 
 # control MasterPi robot with ALIA reasoner and cameras
 # to show debugging images do: "python Ganbei_vis.py 2"
+# to also record reasoner I/O do: "python Ganbei_vis.py 2 /tmp/run1"
+#   (reasoner then runs inline instead of in its own process)
+# to use simulated expansion board and sonar add "sim" anywhere
+#   (cameras, reasoner, and speech still need the robot itself, for a
+#    headless load test of arm, base, and LEDs use "mpi_sim.py bench")
 
 class GanbeiVis:
 
@@ -57,45 +72,71 @@ class GanbeiVis:
     signal.signal(signal.SIGINT, self.Quit)
     signal.signal(signal.SIGTERM, self.Quit)
 
-    # reinitialize sound system early on (slow to reboot)
-    os.system("pulseaudio --start > /dev/null 2>&1")
-
     # main loop timing (30Hz)
-    self.tick = 0.0
     self.cycle = 1.0 / 30.0
     self.ok = -4
 
+    # individual task rates (Hz) and overrun policies
+    # base stays at loop rate since wheel ramps use odometry update time
+    self.sched = RateSched()
+    self.sched.Add('think', 30, 'degrade', 10)
+    self.sched.Add('arm',   30, 'catch')
+    self.sched.Add('base',  30, 'catch')
+    self.sched.Add('body',  10, 'skip')
+    self.view = None
+    self.fresh = False
+
+    # per-phase timing statistics
+    self.prof = CycleProf(self.cycle)
+
     # get beeping threshold
     self.v10 = LowBatt()
 
-    # turn on body LEDs very early
-    self.body = MpiShell(self.bot)
+    # turn on body LEDs very early (sonar eyes breathe by themselves)
+    self.body = MpiShell(self.bot, 1)
 
     # set up color camera and depth sensor
     self.rgb = MpiCam()
     self.tof = TofCam()
     self.rcnt = 0
     self.ccnt = 0
-    self.rt0 = 0.0
-    self.ct0 = 0.0
     self.t0  = 0.0
 
-    # create reasoner and language components
-    self.ai   = AliaVis()
+    # background restarts for cameras (Pi4 vs Pi5 USB hub)
+    self.watch = CamWatch(self.rgb, self.tof, 2 if self.v10 < 6.5 else 3)
+
+    # create reasoner (own process, AliaVis for inline) and language components
+    # recording needs inline reasoner so each record holds one real Think()
+    if len(sys.argv) > 2:
+      self.ai = AliaVis()
+    else:
+      self.ai = AliaProc()
     self.reco = AzureReco()
     self.face = MpiFace()
 
-    # interface to hardware components (arm poses itself)
-    self.arm  = MpiArm(self.bot)
+    # interface to hardware components (arm posed during startup)
+    self.arm  = MpiArm(self.bot, 0)
+    self.arm.Rate(self.sched.Rate('arm'))
     self.base = MpiBase(self.bot)
+    self.imu  = MpiImu(self.bot)
+    self.sonar = MpiSonar(self.bot)
+
+    # reflex slows or stops wheels near obstacles (runs once sensors ready)
+    self.guard = MpiGuard(self.bot, self.sonar, self.watch, self.arm)
 
-    # mouth LED state variables
+    # mouth LED state variable
     self.mth0 = -1
-    self.col0 = -1
 
     # action speed factor
     self.sf = 1.0
 
+    # latest snapshot of reasoner commands
+    self.c = None
+    self.boot = InitGraph()
+
+    # optional recording of reasoner inputs and outputs
+    self.log = None
+
 
   # request termination after next loop finishes
   # Note: can be called externally
@@ -119,134 +160,113 @@ class GanbeiVis:
     try:
       self.start()
       while self.loop: 
+        self.prof.Begin()
+        self.pace()
+        t = self.prof.Now()
         self.update()    
-        if self.ai.Think() <= 0:
-          break
+        t = self.prof.Lap('update', t)
+        self.fresh = self.sched.Due('think')
+        if self.fresh:
+          if self.log is not None:
+            self.log.Inputs(self.ai)
+          rc = self.ai.Think()
+          t = self.prof.Lap('think', t)
+          if self.log is not None:
+            self.log.Outputs(self.ai, rc)
+          if rc <= 0:
+            break
         self.issue()
-        self.pace()
+        self.prof.Lap('issue', t)
     except:
       print("\n\x1b[1;33m>>> Unexpected exit!\x1b[0m")   
     self.shutdown()
 
 
-  # sleep until next cycle start time
+  # sleep until some task is due (each keeps its own deadline grid)
 
   def pace(self):
-    now = time.time()
-    if self.tick == 0.0:
-      self.tick = now
-    wait = self.tick - now
+    wait = self.sched.Wait()
     if wait > 0:
-      time.sleep(wait)   
-    else:
-      self.tick = now                  # fallen behind! 
-    self.tick += self.cycle  
+      self.prof.Add('sleep', wait)
+    elif wait < 0:
+      self.prof.Overrun(-wait)         # fallen behind!
 
 
   # configure and start up all components
+  # independent steps run concurrently, dependents wait for prerequisites
 
   def start(self):
     
-    # enable microphone then set system failure flag
+    # whether to show debugging images 
     print('Ganbei_vis - Initializing ...') 
-    os.system("pactl set-source-mute @DEFAULT_SOURCE@ 0")  
     self.loop = False
-
-    # whether to show debugging images 
     self.show = 0                              
     if len(sys.argv) > 1:
       if sys.argv[1].isdigit():
         self.show = int(sys.argv[1])
       else:
         print("\x1b[1;33m>>> Bad argument: show debugging images (1-14)\x1b[0m")
+    if len(sys.argv) > 2:
+      self.log = AliaRec(sys.argv[2], self.ai)
+
+    # USB hub power cycling (color) disturbs sound card and TOF sensor
+    # speech recognition needs reasoner name list, display needs image sizes
+    self.boot.Add('audio', self.audio_init)
+    self.boot.Add('color', self.watch.Boot)
+    self.boot.Add('arm',   self.arm.Startup)
+    self.boot.Add('alia',  lambda: self.ai.Reset('Ganbei_vis', self.show))
+    self.boot.Add('tof',   self.tof.Start, ('color',))
+    self.boot.Add('face',  lambda: self.face.Start("/home/pi/Ganbei"), ('audio', 'color'))
+    self.boot.Add('reco',  self.reco.Start, ('audio', 'color', 'alia'))
+    if self.show > 0:
+      self.boot.Add('view', self.show_init, ('alia',))
+    self.boot.Run()
+    self.boot.Report()
 
-    # start color camera (try power-cycling if balky)
+    # set system failure flag from most basic problem
     self.ok = -4
-    if self.rgb.Start() <= 0:
-      print("\x1b[1;33m>>> Power cycling USB hub for color camera ... \x1b[0m", end='', flush=True)
-      hub = 2 if self.v10 < 6.5 else 3     # Pi4 vs Pi5
-      os.system(f"sudo uhubctl -l{hub} -a0 > /dev/null")
-      time.sleep(1.0)  
-      os.system(f"sudo uhubctl -l{hub} -a1 > /dev/null")
-      time.sleep(3.0)                 
-      os.system("pulseaudio -k")           # make sure USB sound card found 
-      print()
-      if self.rgb.Start() <= 0:
-        print("\x1b[1;33m>>> Could not connect to color camera!\x1b[0m")
+    for step, msg in (('color', "Could not connect to color camera!"),
+                      ('tof',   "Could not connect to TOF sensor!"),
+                      ('face',  "No text-to-speech!"),
+                      ('alia',  "Problem with ALIA!")):
+      if self.boot.Result(step) <= 0:
+        print("\x1b[1;33m>>> " + msg + "\x1b[0m")
         return
+      self.ok += 1
 
-    # start depth finder
-    self.ok = -3
-    if self.tof.Start() <= 0:
-      print("\x1b[1;33m>>> Could not connect to TOF sensor!\x1b[0m")
-      return
-
-    # start speech output
-    self.ok = -2
-    if self.face.Start("/home/pi/Ganbei") <= 0:
-      print("\x1b[1;33m>>> No text-to-speech!\x1b[0m")
-      return
-
-    # start reasoner (make name list and set image sizes)
-    self.ok = -1
-    if self.ai.Reset('Ganbei_vis', self.show) <= 0:      
-      print("\x1b[1;33m>>> Problem with ALIA!\x1b[0m")
-      return
-
-    # start network speech recognition (needs name list)
-    self.ok = 0
-    if self.reco.Start() <= 0:        
+    # continue as text-only if no network speech recognition
+    if self.boot.Result('reco') <= 0:        
       print("\n\x1b[1;33m>>> No speech recognition!\x1b[0m")
-      PlaySFX("toot")                  # continue as text-only
-
-    # possibly add camera and debugging displays (needs image sizes)
-    if self.show > 0:
-      self.show_init()
+      PlaySFX("toot")
 
     # initialize video stats and watchdogs
     self.t0 = time.time()
-    self.rt0 = self.t0
-    self.ct0 = self.t0
+    self.watch.Watch()
+    self.guard.Watch()
     self.ok = 1
     self.loop = True                   # okay to run
 
 
-  # create and display debugging image windows (after ALIA init)
+  # reinitialize sound system then enable microphone
 
-  def show_init(self):
+  def audio_init(self):
+    os.system("pulseaudio --start > /dev/null 2>&1")
+    os.system("pactl set-source-mute @DEFAULT_SOURCE@ 0")  
+    return 1
+
+
+  # start debugging image viewer process (after ALIA init)
+  # reasoner renders directly into viewer's shared memory images
 
-    # object detection (color camera)
-    self.cam = np.zeros((480, 640, 3), np.uint8)
-    self.cam[:, :, 0] = 255                                # blue
-    cv2.namedWindow("Camera View", flags=cv2.WINDOW_GUI_NORMAL)
-    cv2.resizeWindow("Camera View", 640, 480)
-    cv2.moveWindow("Camera View", 0, 0)
-    cv2.imshow("Camera View", self.cam)
-
-    # debugging image (ALIA sets size)
-    mw = self.ai.MapW()
-    mh = self.ai.MapH()
-    self.map = np.zeros((mh, mw, 3), np.uint8)
-    self.map[:, :, 1] = 128                                # green
-    cv2.namedWindow("Overhead Map", flags=cv2.WINDOW_GUI_NORMAL)
-    cv2.resizeWindow("Overhead Map", mw, mh)     
-    cv2.setWindowTitle("Overhead Map", self.ai.MapT())
-    cv2.moveWindow("Overhead Map", 650, 0)                 # ignores!   
-    cv2.imshow("Overhead Map", self.map)
-
-    # connect images to ALIA
-    self.ai.View.value = self.cam.ctypes.data 
-    self.ai.Map.value  = self.map.ctypes.data
+  def show_init(self):
+    self.view = ImgViewer(self.ai.MapW(), self.ai.MapH(), self.ai.MapT())
+    if isinstance(self.ai, AliaProc):
+      self.ai.Share(self.view.Names())
+    else:
+      self.ai.View.value = self.view.cam.ctypes.data 
+      self.ai.Map.value  = self.view.map.ctypes.data
     self.ai.Vfmt.value = 2
     self.ai.Mfmt.value = 2
-
-    # needs >200ms for fill and initialization 
-    # to regrab terminal needs: sudo apt install wmctrl
-    cv2.waitKey(500);   
-    cv2.moveWindow("Overhead Map", 650, 0)                 # works here
-    cv2.moveWindow("Camera View", 0, 0)
-    title = os.getlogin() + "@" + socket.gethostname()
-    os.system("wmctrl -a " + title)                        # reclaim keyboard
     
 
   # cleanly stop all actions and save data
@@ -256,28 +276,44 @@ class GanbeiVis:
     print("\n\nGanbei_vis - Shutting down ...")
 
     # stop reasoning and robot motion
-    if self.ok >= 0:
+    if self.boot.Result('alia') > 0:
       self.ai.Done(1)
     self.bot.Freeze()
+    self.guard.Done()
+    self.sonar.Done()
 
     # stop speech elements
     self.reco.Done()
     self.face.Done()
 
     # stop color camera and depth finder
+    self.watch.Done()
     self.rgb.Done()
     self.tof.Done()
 
     # lights off last
     self.body.Done()                      
+
+    # finish any recording
+    if self.log is not None:
+      self.log.Close()
    
     # get streaming stats
     if self.t0 > 0.0:
       dt = end - self.t0
       print("Range = %3.1f fps, Color = %3.1f fps" % (self.rcnt / dt, self.ccnt / dt))
-
-    # unmute microphone  
-    cv2.destroyAllWindows() 
+      self.prof.Report(('update', 'think', 'issue'))
+      self.sched.Report()
+    self.bot.out.Report()
+    self.body.Report()
+    self.bot.LinkReport()
+    self.imu.Report()
+    self.sonar.Report()
+    self.guard.Report()
+
+    # close debugging display then unmute microphone  
+    if self.view is not None:
+      self.view.Done()
     os.system("pactl set-source-mute @DEFAULT_SOURCE@ 0")                           
     print("Ganbei_vis - Done (%4.2fV)" % (self.body.Battery()))
 
@@ -291,35 +327,58 @@ class GanbeiVis:
                                         
 
   # transfer commands from ALIA reasoner to actuators
+  # each actuator group only refreshed when its own task is due
+  # all packets for the cycle are sent together at the end
 
   def issue(self):
-    self.tts_issue()
-    self.body_issue()
-    if self.arm_mode() > 0:
-      self.neck_issue()
-    else:
-      self.arm_issue()
-    self.base_issue()
-    self.img_issue()
+    self.bot.Hold()                    # one serial write per cycle
+    try:
+      t = self.prof.Now()
+      self.c = self.ai.GetCmds()       # one bulk read of all commands
+      if self.fresh:
+        self.tts_issue()               # new Spout only after Think
+        t = self.prof.Lap('tts_issue', t)
+      if self.sched.Due('body'):
+        self.body_issue()
+        t = self.prof.Lap('body_issue', t)
+      if self.sched.Due('arm'):
+        if self.arm_mode() > 0:
+          self.neck_issue()
+          t = self.prof.Lap('neck_issue', t)
+        else:
+          self.arm_issue()
+          t = self.prof.Lap('arm_issue', t)
+      if self.sched.Due('base'):
+        self.base_issue()
+        self.prof.Lap('base_issue', t)
+    finally:
+      self.bot.Release()
 
 
   # get data from sensors and transfer to ALIA reasoner
 
   def update(self):
+    t = self.prof.Now()
     self.reco_update()
+    t = self.prof.Lap('reco_update', t)
     self.body_update()
+    t = self.prof.Lap('body_update', t)
     self.neck_update()
+    t = self.prof.Lap('neck_update', t)
     self.arm_update()
+    t = self.prof.Lap('arm_update', t)
     self.base_update()
+    t = self.prof.Lap('base_update', t)
     self.img_update()
+    self.prof.Lap('img_update', t)
 
 
   # determine if arm is in regular (0) or pseudo-neck mode (1)
 
   def arm_mode(self):
-    arm = max(self.ai.Api.value, self.ai.Adi.value, self.ai.Aji.value)
-    rng = max(self.ai.Rpi.value, self.ai.Rti.value, self.ai.Rgi.value)
-    col = max(self.ai.Cpi.value, self.ai.Cti.value) 
+    arm = max(self.c.Api, self.c.Adi, self.c.Aji)
+    rng = max(self.c.Rpi, self.c.Rti, self.c.Rgi)
+    col = max(self.c.Cpi, self.c.Cti) 
     if max(rng, col) > arm:
       return 1
     return 0
@@ -332,12 +391,14 @@ class GanbeiVis:
   def tts_issue(self):
     # set appropriate prosody (and possibly expression) for current mood
     # [ surprised angry scared happy : unhappy bored lonely tired ]
-    self.face.Mood(self.ai.Mood.value)
+    self.face.Mood(self.c.Mood)
 
     # check for message to speak
     msg = self.ai.Spout()
     if msg != '':
       self.face.Say(msg)
+      if self.log is not None:
+        self.log.Text(SPOUT, msg)
 
 
   # feed ALIA any speech recognition results
@@ -347,7 +408,10 @@ class GanbeiVis:
     self.ai.Hear.value = snd      
     if snd == 2:
       msg = self.reco.Heard()
-      self.ai.Spin(msg, self.reco.Delay())
+      ms = self.reco.Delay()
+      self.ai.Spin(msg, ms)
+      if self.log is not None:
+        self.log.Text(SPIN, msg, ms)
 
 
   # -------------------------------- BODY ---------------------------------
@@ -374,17 +438,13 @@ class GanbeiVis:
       self.mth0 = mth
 
     # set LED mouth color (listening glow < talk flashing)
-    attn = self.ai.Attn.value
+    attn = self.c.Attn
     self.face.Stare(attn)              # screen face eye color
-    col = mth
-    if col < 0 and attn > 1:  
-      col = 0x80FF00                   # listening = green
-    if col != self.col0:                   
-      self.body.Talk(col)  
-      self.col0 = col
+    self.body.Talk(mth)
+    self.body.Listen(attn > 1)         # listening = green
 
     # modulate action speeds based on emotion
-    m = self.ai.Mood.value
+    m = self.c.Mood
     self.sf = 1.0
     if m & 0x21 != 0:                  # scared or tired
       self.sf = 0.8
@@ -437,42 +497,42 @@ class GanbeiVis:
   def neck_issue(self):
 
     # determine sensor importance
-    gbid = self.ai.Rgi.value
-    rbid = max(self.ai.Rpi.value, self.ai.Rti.value) 
-    cbid = max(self.ai.Cpi.value, self.ai.Cti.value) 
+    gbid = self.c.Rgi
+    rbid = max(self.c.Rpi, self.c.Rti) 
+    cbid = max(self.c.Cpi, self.c.Cti) 
 
     # color camera angles 
     if cbid > max(rbid, gbid):
       p0, t0, _ = self.arm.View()
-      pan = self.ai.Cpt.value 
-      if self.ai.Cpv.value == 0:
+      pan = self.c.Cpt 
+      if self.c.Cpv == 0:
         pan = p0                       # no motion default
-      tilt = self.ai.Ctt.value 
-      if self.ai.Ctv.value == 0:
+      tilt = self.c.Ctt 
+      if self.c.Ctv == 0:
         tilt = t0                      # no motion default
-      sp = max(self.ai.Cpv.value, self.ai.Ctv.value)
+      sp = max(self.c.Cpv, self.c.Ctv)
       self.arm.Gaze(pan, tilt, self.sf * sp)
       self.face.Gaze(pan, tilt, self.sf * sp * 120.0)      # needs dps
 
     # range-finder angles 
     elif rbid >= gbid:
       p0, t0, _ = self.arm.View()
-      pan = self.ai.Rpt.value 
-      if self.ai.Rpv.value == 0:
+      pan = self.c.Rpt 
+      if self.c.Rpv == 0:
         pan = p0                       # no motion default
-      tilt = self.ai.Rtt.value 
-      if self.ai.Rtv.value == 0:
+      tilt = self.c.Rtt 
+      if self.c.Rtv == 0:
         tilt = t0                      # no motion default
-      sp = max(self.ai.Rpv.value, self.ai.Rtv.value)
+      sp = max(self.c.Rpv, self.c.Rtv)
       self.arm.Gaze(pan, tilt, self.sf * sp)
       self.face.Gaze(pan, tilt, self.sf * sp * 120.0)      # needs dps
 
     # range-finder view location (xyz)
     else:                              # bid guaranteed non-zero
-      x = self.ai.Rxt.value
-      y = self.ai.Ryt.value
-      z = self.ai.Rzt.value
-      sp = self.ai.Rgv.value
+      x = self.c.Rxt
+      y = self.c.Ryt
+      z = self.c.Rzt
+      sp = self.c.Rgv
       self.arm.LookAt(x, y, z, 2, self.sf * sp)            # avg tof + rgb
 
       # approx pan and tilt from screen face center (+20 deg tilt?)
@@ -484,8 +544,8 @@ class GanbeiVis:
       self.face.Gaze(pan, tilt, self.sf * sp * 120.0)      # needs dps
      
     # ALWAYS interpret gripper command then set all arm joints 
-    sp = self.ai.Awv.value if self.ai.Awi.value > 0 else 0.0
-    self.arm.Grip(self.ai.Awt.value, self.sf * sp)
+    sp = self.c.Awv if self.c.Awi > 0 else 0.0
+    self.arm.Grip(self.c.Awt, self.sf * sp)
     self.arm.Issue()
 
 
@@ -510,32 +570,32 @@ class GanbeiVis:
   def arm_issue(self):
 
     # return arm to tucked travel position
-    mbid = max(self.ai.Api.value, self.ai.Adi.value)
-    if self.ai.Aji.value > mbid:
+    mbid = max(self.c.Api, self.c.Adi)
+    if self.c.Aji > mbid:
       b, s, e, w = self.arm.Home()
       b0, _, _, _ = self.arm.Angles()
       if self.arm.ErrAng(b0, s, e, w) > 2:       # swivel last
         b = b0
-      self.arm.Pose(b, s, e, w, self.sf * self.ai.Ajv.value) 
+      self.arm.Pose(b, s, e, w, self.sf * self.c.Ajv) 
 
     # use arm to position gripper (check mode ...)
     else:
-      x, y, z = self.ai.Axt.value, self.ai.Ayt.value, self.ai.Azt.value
-      if self.ai.Apv.value == 0:
+      x, y, z = self.c.Axt, self.c.Ayt, self.c.Azt
+      if self.c.Apv == 0:
         x, y, z = self.arm.Position()    # no motion default
-      t = self.ai.Att.value
-      tex = self.ai.Adm.value & 0x02     # exact tilt 
-      if self.ai.Adv.value == 0:
+      t = self.c.Att
+      tex = self.c.Adm & 0x02     # exact tilt 
+      if self.c.Adv == 0:
         _,t,_ = self.arm.Orientation()   # no motion default
         tex = 0
-      sp = max(self.ai.Apv.value, self.ai.Adv.value) if mbid > 0 else 0.0
-#      if self.ai.Apm.value != 0 or self.ai.Adm.value & 0x07 != 0:
+      sp = max(self.c.Apv, self.c.Adv) if mbid > 0 else 0.0
+#      if self.c.Apm != 0 or self.c.Adm & 0x07 != 0:
 #        sp = -abs(sp)                    # linear trajectory 
       self.arm.Move(x, y, z, t, tex, self.sf * sp)
 
     # ALWAYS interpret gripper command then set all arm joints 
-    sp = self.ai.Awv.value if self.ai.Awi.value > 0 else 0.0
-    self.arm.Grip(self.ai.Awt.value, self.sf * sp)
+    sp = self.c.Awv if self.c.Awi > 0 else 0.0
+    self.arm.Grip(self.c.Awt, self.sf * sp)
     self.arm.Issue()
 
 
@@ -563,66 +623,52 @@ class GanbeiVis:
   # set wheel velocities based on rate and sign of incremental amount  
 
   def base_issue(self):
-    msp = self.sf * self.ai.Bmv.value
-    tsp = self.sf * self.ai.Brv.value
-    self.base.Drive(self.ai.Bmt.value, self.ai.Brt.value, msp, tsp, self.ai.Bsk.value)
+    msp = self.sf * self.c.Bmv
+    tsp = self.sf * self.c.Brv
+    self.base.Drive(self.c.Bmt, self.c.Brt, msp, tsp, self.c.Bsk)
 
 
   # get odometry estimate from wheels and updated body orientation
 
   def base_update(self):
+    hd, tilt, roll, _ = self.imu.Attitude()
+    if self.imu.Ready():
+      self.base.Compass(hd)            # real rotation instead of wheel estimate
+    else:
+      self.base.NoCompass()
     self.base.Update()
+    self.ai.Tilt.value, self.ai.Roll.value = tilt, roll
     self.ai.Bt.value, self.ai.Bw.value, self.ai.Bx.value, self.ai.By.value = self.base.Odom()
 
 
   # ------------------------------- IMAGES -------------------------------- 
  
-  # get new marked-up camera view and overhead map (if desired)
-
-  def img_issue(self):
-    if self.show <= 0:
-      return
-    cv2.imshow("Camera View", self.cam);  
-    cv2.imshow("Overhead Map", self.map);       
-    cv2.waitKey(1)                               # needed to pump update message
-
-
   # check for new color or range images
+  # CamWatch handles restarts in background so this never blocks
 
   def img_update(self):
-    now = time.time()
 
     # color camera 
-    buf = self.rgb.Color(0, 0)
+    buf = self.watch.Color()
     if buf is not None:
       self.ai.Col.value = buf
+      if self.log is not None:
+        self.log.Color(buf)
       self.ai.Cfmt.value = 3
-      self.ct0 = now                             # reset timeout
       self.ccnt += 1
-      if self.ok == -4:                          # restart successful
-        self.ok = 1
-    elif (now - self.ct0) > 0.5: 
-      if self.ok <= 0:     
-        self.loop = False
-      else:                                      # attempt recovery   
-        print("\n\x1b[1;33m>>> Color camera restarting ...\x1b[0m")
-        self.ok = 0
-        self.rgb.Done()
-        if self.rgb.Start() > 0:
-          self.ct0 = time.time()
-        else:
-          print("\x1b[1;33m>>> Color camera stopped working!\x1b[0m")
-          self.loop = False
 
     # range finder
-    buf = self.tof.Range(0, 0)
+    buf = self.watch.Range()
     if buf is not None:
       self.ai.Rng.value = buf
+      if self.log is not None:
+        self.log.Range(buf)
       self.ai.Rfmt.value = 3   
-      self.rt0 = now                             # reset timeout
       self.rcnt += 1   
-    elif self.ok > 0 and (now - self.rt0) > 0.5:             
-      print("\n\x1b[1;33m>>> TOF sensor stopped working!\x1b[0m")
+
+    # quit if either sensor has given up
+    col, rng = self.watch.Health()
+    if min(col, rng) < 0 and self.ok > 0:
       self.ok = 0
       self.loop = False
             
@@ -633,7 +679,11 @@ class GanbeiVis:
 # "bot" must be made here so only one process owns serial port
 
 def main():
-  bot = MasterPi()    
+  if 'sim' in sys.argv:
+    sys.argv.remove('sim')
+    bot = SimPi()
+  else:
+    bot = MasterPi()    
   g = GanbeiVis(bot)
   g.Run()
 
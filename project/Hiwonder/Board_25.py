@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # encoding: utf-8
 # stm32 python sdk
+import sys
 import enum
 import time
 import copy
@@ -8,6 +9,14 @@ import queue
 import struct
 import serial
 import threading
+import collections
+from concurrent.futures import Future, wait
+import board_codec
+from board_codec import PacketFunction, encode_packet, decode_frames, bench_main
+
+# JHC: CRC pieces now live in board_codec, kept here for older callers
+crc8_table = board_codec.crc8_table
+checksum_crc8 = board_codec.checksum_crc8
 
 # JHC: this file was originally named "ros_robot_controller_sdk.py"
 
@@ -22,22 +31,6 @@ class PacketControllerState(enum.IntEnum):
     PACKET_CONTROLLER_STATE_DATA = 5
     PACKET_CONTROLLER_STATE_CHECKSUM = 6
 
-class PacketFunction(enum.IntEnum):
-    # 可通过串口实现的控制功能
-    PACKET_FUNC_SYS = 0
-    PACKET_FUNC_LED = 1  # LED控制
-    PACKET_FUNC_BUZZER = 2  # 蜂鸣器控制
-    PACKET_FUNC_MOTOR = 3  # 电机控制
-    PACKET_FUNC_PWM_SERVO = 4  # PWM舵机控制, 板子上从里到外依次为1-4
-    PACKET_FUNC_BUS_SERVO = 5  # 总线舵机控制
-    PACKET_FUNC_KEY = 6  # 按键获取
-    PACKET_FUNC_IMU = 7  # IMU获取
-    PACKET_FUNC_GAMEPAD = 8  # 手柄获取
-    PACKET_FUNC_SBUS = 9  # 航模遥控获取
-    PACKET_FUNC_OLED = 10 # OLED 显示内容设置
-    PACKET_FUNC_RGB = 11 # 设置RGB颜色
-    PACKET_FUNC_NONE = 12
-
 class PacketReportKeyEvents(enum.IntEnum):
     # 按键的不同状态
     KEY_EVENT_PRESSED = 0x01
@@ -49,31 +42,187 @@ class PacketReportKeyEvents(enum.IntEnum):
     KEY_EVENT_DOUBLE_CLICK= 0x40
     KEY_EVENT_TRIPLE_CLICK = 0x80
 
-crc8_table = [
-    0, 94, 188, 226, 97, 63, 221, 131, 194, 156, 126, 32, 163, 253, 31, 65,
-    157, 195, 33, 127, 252, 162, 64, 30, 95, 1, 227, 189, 62, 96, 130, 220,
-    35, 125, 159, 193, 66, 28, 254, 160, 225, 191, 93, 3, 128, 222, 60, 98,
-    190, 224, 2, 92, 223, 129, 99, 61, 124, 34, 192, 158, 29, 67, 161, 255,
-    70, 24, 250, 164, 39, 121, 155, 197, 132, 218, 56, 102, 229, 187, 89, 7,
-    219, 133, 103, 57, 186, 228, 6, 88, 25, 71, 165, 251, 120, 38, 196, 154,
-    101, 59, 217, 135, 4, 90, 184, 230, 167, 249, 27, 69, 198, 152, 122, 36,
-    248, 166, 68, 26, 153, 199, 37, 123, 58, 100, 134, 216, 91, 5, 231, 185,
-    140, 210, 48, 110, 237, 179, 81, 15, 78, 16, 242, 172, 47, 113, 147, 205,
-    17, 79, 173, 243, 112, 46, 204, 146, 211, 141, 111, 49, 178, 236, 14, 80,
-    175, 241, 19, 77, 206, 144, 114, 44, 109, 51, 209, 143, 12, 82, 176, 238,
-    50, 108, 142, 208, 83, 13, 239, 177, 240, 174, 76, 18, 145, 207, 45, 115,
-    202, 148, 118, 40, 171, 245, 23, 73, 8, 86, 180, 234, 105, 55, 213, 139,
-    87, 9, 235, 181, 54, 104, 138, 212, 149, 203, 41, 119, 244, 170, 72, 22,
-    233, 183, 85, 11, 136, 214, 52, 106, 43, 117, 151, 201, 74, 20, 246, 168,
-    116, 42, 200, 150, 21, 75, 169, 247, 182, 232, 10, 84, 215, 137, 107, 53
-]
-
-def checksum_crc8(data):
-    # 校验
-    check = 0
-    for b in data:
-        check = crc8_table[check ^ b]
-    return check & 0x00FF
+class TeleSlot:
+    # JHC: newest sample of one report channel with arrival time and count
+    def __init__(self, ring=0):
+        self.data = None
+        self.t = 0.0
+        self.seq = 0
+        self.ring = collections.deque(maxlen=ring) if ring > 0 else None
+        self.subs = []
+
+class Telemetry:
+    # JHC: latest-value store for board reports (replaces size 1 queues)
+    # readers never see stale data left over from before newer samples
+    # high-rate channels can also keep a ring of (time, data) history
+    def __init__(self):
+        self.cv = threading.Condition()
+        self.slots = {}
+
+    def channel(self, name, ring=0):
+        with self.cv:
+            if name not in self.slots:
+                self.slots[name] = TeleSlot(ring)
+            return self.slots[name]
+
+    def put(self, name, data):
+        slot = self.slots.get(name) or self.channel(name)
+        with self.cv:
+            slot.data = data
+            slot.t = time.monotonic()
+            slot.seq += 1
+            if slot.ring is not None:
+                slot.ring.append((slot.t, data))
+            t, seq, subs = slot.t, slot.seq, tuple(slot.subs)
+            self.cv.notify_all()
+        for fn in subs:
+            try:
+                fn(data, t, seq)
+            except Exception:
+                pass
+
+    # newest (data, time, seq) or None if nothing received yet
+    def latest(self, name):
+        slot = self.slots.get(name)
+        if slot is None or slot.seq <= 0:
+            return None
+        with self.cv:
+            return slot.data, slot.t, slot.seq
+
+    # newest sample only if it arrived after the one numbered seq
+    def since(self, name, seq):
+        got = self.latest(name)
+        if got is None or got[2] <= seq:
+            return None
+        return got
+
+    # block until a sample newer than seq arrives (None if timeout)
+    def wait(self, name, seq=0, timeout=None):
+        slot = self.channel(name)
+        with self.cv:
+            if not self.cv.wait_for(lambda: slot.seq > seq, timeout):
+                return None
+            return slot.data, slot.t, slot.seq
+
+    # recent (time, data) pairs oldest first (only if ring requested)
+    def history(self, name):
+        slot = self.slots.get(name)
+        if slot is None or slot.ring is None:
+            return []
+        with self.cv:
+            return list(slot.ring)
+
+    # call fn(data, time, seq) from receive thread on every new sample
+    def subscribe(self, name, fn):
+        slot = self.channel(name)
+        with self.cv:
+            slot.subs.append(fn)
+
+    def unsubscribe(self, name, fn):
+        slot = self.channel(name)
+        with self.cv:
+            if fn in slot.subs:
+                slot.subs.remove(fn)
+
+class LinkStats:
+    # JHC: serial link counters (receive ones only changed by receive thread,
+    # transmit ones only by writer thread or under transmit lock)
+    def __init__(self):
+        self.t0 = time.monotonic()
+        self.bytes_in = 0
+        self.frames_in = 0
+        self.bytes_out = 0
+        self.frames_out = 0
+        self.writes = 0
+        self.crc_fails = 0
+        self.resyncs = 0
+        self.junk = 0                  # bytes skipped looking for header
+        self.rx_errors = 0
+        self.tx_errors = 0
+        self.superseded = 0            # queued packets replaced before sending
+        self.drops = collections.Counter()
+        self.retries = collections.Counter()   # packets resent after failed write
+        self.lost = collections.Counter()      # packets given up on
+        self.lat_sum = 0.0             # packet queued to written (secs)
+        self.lat_max = 0.0
+        self.wr_sum = 0.0              # time inside port.write (secs)
+        self.wr_max = 0.0
+
+    def snapshot(self):
+        dt = max(1e-6, time.monotonic() - self.t0)
+        nf, nw = max(1, self.frames_out), max(1, self.writes)
+        return {'secs': dt,
+                'bytes_in': self.bytes_in, 'frames_in': self.frames_in,
+                'bytes_out': self.bytes_out, 'frames_out': self.frames_out, 'writes': self.writes,
+                'in_bps': self.bytes_in / dt, 'out_bps': self.bytes_out / dt,
+                'in_fps': self.frames_in / dt, 'out_fps': self.frames_out / dt,
+                'crc_fails': self.crc_fails, 'resyncs': self.resyncs, 'junk': self.junk,
+                'rx_errors': self.rx_errors, 'tx_errors': self.tx_errors,
+                'superseded': self.superseded, 'drops': dict(self.drops),
+                'retries': dict(self.retries), 'lost': dict(self.lost),
+                'lat_avg': self.lat_sum / nf, 'lat_max': self.lat_max,
+                'write_avg': self.wr_sum / nw, 'write_max': self.wr_max}
+
+class ReplyMux:
+    # JHC: matches servo read replies to outstanding requests
+    # replies carry servo id and sub command so many reads can be in flight
+    # each request is a Future which gets the raw reply data
+    def __init__(self, send):
+        self.send = send               # send(func, data) queues request
+        self.lock = threading.Lock()
+        self.pend = {}                 # (func, cmd, id) -> list of Futures
+
+    def request(self, func, cmd, servo_id):
+        fut = Future()
+        fut.key = (int(func), cmd, servo_id)
+        with self.lock:
+            self.pend.setdefault(fut.key, []).append(fut)
+        self.send(func, [cmd, servo_id])
+        return fut
+
+    # hand reply to oldest matching request (254 = broadcast id)
+    # returns False if nobody was waiting (e.g. came after timeout)
+    def reply(self, func, data):
+        if len(data) < 2:
+            return False
+        with self.lock:
+            for key in ((int(func), data[1], data[0]), (int(func), data[1], 254)):
+                waiting = self.pend.get(key)
+                if waiting:
+                    fut = waiting.pop(0)
+                    if not waiting:
+                        del self.pend[key]
+                    break
+            else:
+                return False
+        fut.set_result(data)
+        return True
+
+    # wait for a group of requests resending any unanswered ones
+    # returns raw reply data for each (None if never answered)
+    def collect(self, futs, timeout=0.03, tries=3):
+        for i in range(tries):
+            _, late = wait(futs, timeout)
+            if not late or i >= tries - 1:
+                break
+            for fut in late:
+                func, cmd, servo_id = fut.key
+                self.send(func, [cmd, servo_id])
+        for fut in futs:
+            if not fut.done():
+                self.drop(fut)
+        return [fut.result(timeout) if not fut.cancelled() else None for fut in futs]
+
+    # give up on request unless its reply is already being delivered
+    def drop(self, fut):
+        with self.lock:
+            waiting = self.pend.get(fut.key)
+            if not waiting or fut not in waiting:
+                return
+            waiting.remove(fut)
+            if not waiting:
+                del self.pend[fut.key]
+        fut.cancel()
 
 class SBusStatus:
     def __init__(self):
@@ -99,28 +248,28 @@ class Board:
             'GAMEPAD_BUTTON_MASK_R1':        0x8000
     }
 
-    def __init__(self, device="/dev/ttyAMA0", baudrate=1000000, timeout=5):
+    # JHC: port can instead be any object with in_waiting, read, write, close
+    def __init__(self, device="/dev/ttyAMA0", baudrate=1000000, timeout=5, port=None):
         self.enable_recv = False
-        self.frame = []
-        self.recv_count = 0
-
-        self.port = serial.Serial(None, baudrate, timeout=timeout)
-        self.port.rts = False
-        self.port.dtr = False
-        self.port.setPort(device)
-        self.port.open()
-
-        self.state = PacketControllerState.PACKET_CONTROLLER_STATE_STARTBYTE1
-        self.servo_read_lock = threading.Lock()
-        self.pwm_servo_read_lock = threading.Lock()
-        
-        self.sys_queue = queue.Queue(maxsize=1)
-        self.bus_servo_queue = queue.Queue(maxsize=1)
-        self.pwm_servo_queue = queue.Queue(maxsize=1)
-        self.key_queue = queue.Queue(maxsize=1)
-        self.imu_queue = queue.Queue(maxsize=1)
-        self.gamepad_queue = queue.Queue(maxsize=1)
-        self.sbus_queue = queue.Queue(maxsize=1)
+        self.rbuf = bytearray()        # JHC: unparsed received bytes
+        self.link = LinkStats()
+
+        if port is None:
+            port = serial.Serial(None, baudrate, timeout=timeout)
+            port.rts = False
+            port.dtr = False
+            port.setPort(device)
+            port.open()
+        self.port = port
+
+        self.mux = ReplyMux(lambda func, data: self.buf_write(func, data, urgent=True))
+
+        # JHC: periodic reports keep only newest sample (IMU has history too)
+        self.tele = Telemetry()
+        for name in ('battery', 'sys', 'key', 'gamepad', 'sbus'):
+            self.tele.channel(name)
+        self.tele.channel('imu', 256)
+        self.seen = {}                 # last sample seq handed out by get_xxx
 
         self.parsers = {
             PacketFunction.PACKET_FUNC_SYS: self.packet_report_sys,
@@ -132,62 +281,79 @@ class Board:
             PacketFunction.PACKET_FUNC_PWM_SERVO: self.packet_report_pwm_servo
         }
 
+        # JHC: transmit queue owned by a single writer thread
+        # keyed packets replace any unsent one with the same key
+        # urgent packets go first and are never held back
+        # failed writes are retried (like original Freeze) then reported
+        self.tx_cv = threading.Condition()
+        self.tx_urgent = []
+        self.tx_pend = {}
+        self.tx_hold = 0
+        self.tx_seq = 0
+        self.tx_tries = 10
+        self.tx_lost = None            # fn(key) called for packets given up on
+
         threading.Thread(target=self.recv_task, daemon=True).start()
+        threading.Thread(target=self.send_task, daemon=True).start()
         time.sleep(0.1)
 
     def __del__(self):
         self.port.close()              # JHC: make sure to free serial port
 
+    # JHC: runs in receive thread so check length before looking inside
     def packet_report_sys(self, data):
-        try:
-            self.sys_queue.put_nowait(data)
-        except queue.Full:
-            pass
+        if len(data) >= 3 and data[0] == 0x04:
+            self.tele.put('battery', data)
+        elif len(data) >= 1 and data[0] != 0x04:
+            self.tele.put('sys', data)
+        else:
+            self.link.rx_errors += 1     # too short to use
 
     def packet_report_key(self, data):
-        try:
-            self.key_queue.put_nowait(data)
-        except queue.Full:
-            pass
+        self.tele.put('key', data)
 
     def packet_report_imu(self, data):
-        try:
-            self.imu_queue.put_nowait(data)
-        except queue.Full:
-            pass
+        self.tele.put('imu', data)
 
     def packet_report_gamepad(self, data):
-        try:
-            self.gamepad_queue.put_nowait(data)
-        except queue.Full:
-            pass
+        self.tele.put('gamepad', data)
 
     def packet_report_serial_servo(self, data):
-        try:
-            self.bus_servo_queue.put_nowait(data)
-        except queue.Full:
-            pass
+        if not self.mux.reply(PacketFunction.PACKET_FUNC_BUS_SERVO, data):
+            self.link.drops['bus_servo'] += 1
 
     def packet_report_pwm_servo(self, data):
-        try:
-            self.pwm_servo_queue.put_nowait(data)
-        except queue.Full:
-            pass
+        if not self.mux.reply(PacketFunction.PACKET_FUNC_PWM_SERVO, data):
+            self.link.drops['pwm_servo'] += 1
 
     def packet_report_sbus(self, data):
-        try:
-            self.sbus_queue.put_nowait(data)
-        except queue.Full:
-            pass
+        self.tele.put('sbus', data)
+
+    # JHC: newest sample of channel not yet returned by a get_xxx call
+    # counts samples overwritten before anyone read them
+    def unread(self, name):
+        last = self.seen.get(name, 0)
+        got = self.tele.since(name, last)
+        if got is None:
+            raise queue.Empty
+        if last > 0 and got[2] > last + 1:
+            self.link.drops[name] += got[2] - last - 1
+        self.seen[name] = got[2]
+        return got[0]
+
+    # JHC: counters and rates for serial link health
+    def link_stats(self):
+        return self.link.snapshot()
+
+    # JHC: have fn(data, time, seq) called on each new report of some channel
+    def subscribe(self, name, fn):
+        self.tele.subscribe(name, fn)
 
     def get_battery(self):
         if self.enable_recv:
             try:
-                data = self.sys_queue.get(block=False)
-                if data[0] == 0x04:
-                    return struct.unpack('<H', data[1:])[0]
-                else:
-                    None
+                data = self.unread('battery')
+                return struct.unpack('<H', data[1:3])[0]
             except queue.Empty:
                 return None
         else:
@@ -197,7 +363,7 @@ class Board:
     def get_button(self):
         if self.enable_recv:
             try:
-                data = self.key_queue.get(block=False)
+                data = self.unread('key')
                 key_id = data[0]
                 key_event = PacketReportKeyEvents(data[1])
                 if key_event == PacketReportKeyEvents.KEY_EVENT_CLICK:
@@ -214,7 +380,7 @@ class Board:
         if self.enable_recv:
             try:
                 # ax, ay, az, gx, gy, gz
-                return struct.unpack('<6f', self.imu_queue.get(block=False))
+                return struct.unpack('<6f', self.unread('imu'))
             except queue.Empty:
                 return None
         else:
@@ -225,7 +391,7 @@ class Board:
         if self.enable_recv:
             try:
                 # buttons, hat, lx, ly, rx, ry
-                gamepad_data = struct.unpack("<HB4b", self.gamepad_queue.get(block=False))
+                gamepad_data = struct.unpack("<HB4b", self.unread('gamepad'))
                 # 'lx', 'ly', 'rx', 'ry', 'r2', 'l2', 'hat_x', 'hat_y'
                 axes = [0, 0, 0, 0, 0, 0, 0, 0]
                 # 'cross', 'circle', '', 'square', 'triangle', '', 'l1', 'r1', 'l2', 'r2', 'select', 'start', '', 'l3', 'r3', ''
@@ -292,7 +458,7 @@ class Board:
     def get_sbus(self):
         if self.enable_recv:
             try:
-                sbus_data = self.sbus_queue.get(block=False)
+                sbus_data = self.unread('sbus')
                 status = SBusStatus()
                 *status.channels, ch17, ch18, sig_loss, fail_safe = struct.unpack("<16hBBBB", sbus_data)
                 status.channel_17 = ch17 != 0
@@ -316,12 +482,100 @@ class Board:
             # print('enable reception first!')
             return None
 
-    def buf_write(self, func, data):
-        buf = [0xAA, 0x55, int(func)]
-        buf.append(len(data))
-        buf.extend(data)
-        buf.append(checksum_crc8(bytes(buf[2:])))
-        self.port.write(buf)
+    def buf_write(self, func, data, key=None, urgent=False):
+        self.send(encode_packet(func, data), key, urgent)
+
+    # JHC: queue a finished packet for the writer thread (as bytes for joining)
+    # items are (time queued, packet, key, failed tries)
+    def send(self, pkt, key=None, urgent=False):
+        with self.tx_cv:
+            if urgent:
+                if key is not None and self.tx_pend.pop(key, None) is not None:
+                    self.link.superseded += 1        # replaced by urgent one
+                self.tx_urgent.append((time.monotonic(), bytes(pkt), key, 0))
+            else:
+                if key is None:
+                    self.tx_seq += 1
+                    key = self.tx_seq
+                if self.tx_pend.pop(key, None) is not None:
+                    self.link.superseded += 1        # newer one goes last
+                self.tx_pend[key] = (time.monotonic(), bytes(pkt), key, 0)
+            self.tx_cv.notify()
+
+    # JHC: put packets from a failed write back in front of newer ones
+    # a packet already replaced by a newer one with the same key is dropped
+    # after tx_tries attempts a packet is given up on and tx_lost is told
+    def tx_retry(self, out, nu):
+        st = self.link
+        lost, urgent, pend = [], [], {}
+        with self.tx_cv:
+            for i, (tq, pkt, key, n) in enumerate(out):
+                name = key if isinstance(key, str) else 'other'
+                if n + 1 >= self.tx_tries:
+                    st.lost[name] += 1
+                    lost.append(key)
+                elif i < nu:
+                    st.retries[name] += 1
+                    urgent.append((tq, pkt, key, n + 1))
+                elif key not in self.tx_pend:
+                    st.retries[name] += 1
+                    pend[key] = (tq, pkt, key, n + 1)
+            self.tx_urgent[:0] = urgent
+            pend.update(self.tx_pend)
+            self.tx_pend = pend
+        if self.tx_lost is not None:
+            for key in lost:
+                self.tx_lost(key)
+
+    # JHC: collect packets made during a control cycle (nestable)
+    def tx_batch(self):
+        with self.tx_cv:
+            self.tx_hold += 1
+
+    # JHC: send everything collected since tx_batch as one write
+    def tx_flush(self):
+        with self.tx_cv:
+            self.tx_hold = max(0, self.tx_hold - 1)
+            self.tx_cv.notify()
+
+    # JHC: write all queued packets with a single call whenever allowed
+    def send_task(self):
+        while True:
+            with self.tx_cv:
+                while not self.tx_urgent and (self.tx_hold > 0 or not self.tx_pend):
+                    self.tx_cv.wait()
+                out = self.tx_urgent
+                nu = len(out)
+                self.tx_urgent = []
+                if self.tx_hold <= 0:
+                    out.extend(self.tx_pend.values())
+                    self.tx_pend.clear()
+            st = self.link
+            data = b''.join(item[1] for item in out)
+            t0 = time.monotonic()
+            done = 0
+            try:
+                if nu > 0 and hasattr(self.port, 'write_urgent'):
+                    self.port.write_urgent(b''.join(item[1] for item in out[:nu]))
+                    done = nu
+                    if nu < len(out):
+                        self.port.write(b''.join(item[1] for item in out[nu:]))
+                else:
+                    self.port.write(data)
+            except:
+                st.tx_errors += 1
+                self.tx_retry(out[done:], nu - done)
+                time.sleep(0.01)
+                continue
+            t1 = time.monotonic()
+            st.writes += 1
+            st.bytes_out += len(data)
+            st.frames_out += len(out)
+            st.wr_sum += t1 - t0
+            st.wr_max = max(st.wr_max, t1 - t0)
+            for tq, *_ in out:
+                st.lat_sum += t1 - tq
+                st.lat_max = max(st.lat_max, t1 - tq)
 
     def set_led(self, on_time, off_time, repeat=1, led_id=1):
         on_time = int(on_time*1000)
@@ -331,7 +585,7 @@ class Board:
     def set_buzzer(self, freq, on_time, off_time, repeat=1):
         on_time = int(on_time*1000)
         off_time = int(off_time*1000)
-        self.buf_write(PacketFunction.PACKET_FUNC_BUZZER, struct.pack("<HHHH", freq, on_time, off_time, repeat))
+        self.buf_write(PacketFunction.PACKET_FUNC_BUZZER, struct.pack("<HHHH", freq, on_time, off_time, repeat), 'buzzer')
 
     def set_motor_speed(self, speeds):
         data = [0x01, len(speeds)]
@@ -348,31 +602,36 @@ class Board:
         data = [0x01, len(pixels), ]
         for index, r, g, b in pixels:
             data.extend(struct.pack("<BBBB", int(index - 1), int(r), int(g), int(b)))
-        self.buf_write(PacketFunction.PACKET_FUNC_RGB, data)
+        self.buf_write(PacketFunction.PACKET_FUNC_RGB, data, 'rgb' if len(pixels) == 2 else None)
 
-    def set_motor_duty(self, dutys):
+    def set_motor_duty(self, dutys, urgent=False):
         data = [0x05, len(dutys)]
         for i in dutys:
             data.extend(struct.pack("<Bf", int(i[0] - 1), float(i[1])))
-        self.buf_write(PacketFunction.PACKET_FUNC_MOTOR, data)
+        self.buf_write(PacketFunction.PACKET_FUNC_MOTOR, data, 'duty', urgent)
 
     def pwm_servo_set_position(self, duration, positions):
         duration = int(duration * 1000)
         data = [0x01, duration & 0xFF, 0xFF & (duration >> 8), len(positions)]
         for i in positions:
             data.extend(struct.pack("<BH", i[0], i[1]))
-        self.buf_write(PacketFunction.PACKET_FUNC_PWM_SERVO, data)
+        self.buf_write(PacketFunction.PACKET_FUNC_PWM_SERVO, data, 'pose' if len(positions) == 5 else None)
     
     def pwm_servo_set_offset(self, servo_id, offset):
         data = struct.pack("<BBb", 0x07, servo_id, int(offset))
         self.buf_write(PacketFunction.PACKET_FUNC_PWM_SERVO, data)
 
-    def pwm_servo_read_and_unpack(self, servo_id, cmd, unpack):
-        with self.servo_read_lock:
-            self.buf_write(PacketFunction.PACKET_FUNC_PWM_SERVO, [cmd, servo_id])
-            data = self.pwm_servo_queue.get(block=True)
-            servo_id, cmd, info = struct.unpack(unpack, data)
-            return info
+    def pwm_servo_read_and_unpack(self, servo_id, cmd, unpack, timeout=0.03, tries=3):
+        return self.pwm_servo_read_many([servo_id], cmd, unpack, timeout, tries)[0]
+
+    # JHC: pipelined reads of several servos in one round trip (None if no reply)
+    def pwm_servo_read_many(self, servo_ids, cmd, unpack, timeout=0.03, tries=3):
+        futs = [self.mux.request(PacketFunction.PACKET_FUNC_PWM_SERVO, cmd, i) for i in servo_ids]
+        return [struct.unpack(unpack, data)[2] if data is not None else None
+                for data in self.mux.collect(futs, timeout, tries)]
+
+    def pwm_servo_read_positions(self, servo_ids):
+        return self.pwm_servo_read_many(servo_ids, 0x05, "<BBH")
 
     def pwm_servo_read_offset(self, servo_id):
         return self.pwm_servo_read_and_unpack(servo_id, 0x09, "<BBb")
@@ -430,13 +689,14 @@ class Board:
             data.extend(struct.pack("<BH", i[0], i[1]))
         self.buf_write(PacketFunction.PACKET_FUNC_BUS_SERVO, data)
 
-    def bus_servo_read_and_unpack(self, servo_id, cmd, unpack):
-        with self.servo_read_lock:
-            self.buf_write(PacketFunction.PACKET_FUNC_BUS_SERVO, [cmd, servo_id])
-            data = self.bus_servo_queue.get(block=True)
-            servo_id, cmd, success, *info = struct.unpack(unpack, data)
-            if success == 0:
-                return info
+    def bus_servo_read_and_unpack(self, servo_id, cmd, unpack, timeout=0.03, tries=3):
+        fut = self.mux.request(PacketFunction.PACKET_FUNC_BUS_SERVO, cmd, servo_id)
+        data = self.mux.collect([fut], timeout, tries)[0]
+        if data is None:
+            return None
+        servo_id, cmd, success, *info = struct.unpack(unpack, data)
+        if success == 0:
+            return info
 
     def bus_servo_read_id(self, servo_id=254):
         return self.bus_servo_read_and_unpack(servo_id, 0x12, "<BBbB")
@@ -468,64 +728,45 @@ class Board:
     def enable_reception(self, enable=True):
         self.enable_recv = enable
 
+    # JHC: grabs everything waiting in one call instead of a byte at a time
     def recv_task(self):
         while True:
             if self.enable_recv:
+              used = 0
               try:                               
-                recv_data = self.port.read()  
+                n = self.port.in_waiting
+                recv_data = self.port.read(n if n > 0 else 1)     # blocks for first byte
                 if recv_data:
-                    for dat in recv_data:
-                        # print("%0.2X "%dat)
-                        if self.state == PacketControllerState.PACKET_CONTROLLER_STATE_STARTBYTE1:
-                            if dat == 0xAA:
-                                self.state = PacketControllerState.PACKET_CONTROLLER_STATE_STARTBYTE2
-                            continue
-                        elif self.state == PacketControllerState.PACKET_CONTROLLER_STATE_STARTBYTE2:
-                            if dat == 0x55:
-                                self.state = PacketControllerState.PACKET_CONTROLLER_STATE_FUNCTION
-                            else:
-                                self.state = PacketControllerState.PACKET_CONTROLLER_STATE_STARTBYTE1
-                            continue
-                        elif self.state == PacketControllerState.PACKET_CONTROLLER_STATE_FUNCTION:
-                            if dat < int(PacketFunction.PACKET_FUNC_NONE):
-                                self.frame = [dat, 0]
-                                self.state = PacketControllerState.PACKET_CONTROLLER_STATE_LENGTH
-                            else:
-                                self.frame = []
-                                self.state = PacketControllerState.PACKET_CONTROLLER_STATE_STARTBYTE1
-                            continue
-                        elif self.state == PacketControllerState.PACKET_CONTROLLER_STATE_LENGTH:
-                            self.frame[1] = dat
-                            self.recv_count = 0
-                            if dat == 0:
-                                self.state = PacketControllerState.PACKET_CONTROLLER_STATE_CHECKSUM
-                            else:
-                                self.state = PacketControllerState.PACKET_CONTROLLER_STATE_DATA
-                            continue
-                        elif self.state == PacketControllerState.PACKET_CONTROLLER_STATE_DATA:
-                            self.frame.append(dat)
-                            self.recv_count += 1
-                            if self.recv_count >= self.frame[1]:
-                                self.state = PacketControllerState.PACKET_CONTROLLER_STATE_CHECKSUM
-                            continue
-                        elif self.state == PacketControllerState.PACKET_CONTROLLER_STATE_CHECKSUM:
-                            crc8 = checksum_crc8(bytes(self.frame))
-                            if crc8 == dat:
-                                func = PacketFunction(self.frame[0])
-                                data = bytes(self.frame[2:])
-                                if func in self.parsers:
-                                    self.parsers[func](data)
-                            else:
-                                print("校验失败")
-                            self.state = PacketControllerState.PACKET_CONTROLLER_STATE_STARTBYTE1
-                            continue
+                    self.link.bytes_in += len(recv_data)
+                    self.rbuf += recv_data
+                    used = len(self.rbuf)        # JHC: drop all if decoding fails
+                    used = self.parse_frames(self.rbuf)
               except:
-                pass                             # JHC: pyserial seems to get NoneType!
+                self.link.rx_errors += 1         # JHC: pyserial seems to get NoneType!
+              finally:
+                if used > 0:
+                    del self.rbuf[:used]         # JHC: never parse same bytes twice
             else:
                 time.sleep(0.01)
         self.port.close()
         print("END...")
 
+    # JHC: dispatches all complete frames in buffer (see board_codec)
+    # returns number of leading bytes consumed (rest is a partial frame)
+    # a parser that fails on some frame does not stop the ones after it
+    def parse_frames(self, buf):
+        frames, used = decode_frames(buf, self.link)
+        for func, data in frames:
+            parser = self.parsers.get(func)
+            if parser is not None:
+                try:
+                    parser(data)
+                except Exception:
+                    self.link.rx_errors += 1     # JHC: bad frame only loses itself
+            else:
+                self.link.drops[PacketFunction(func).name[12:].lower()] += 1
+        return used
+
 def bus_servo_test(board):
     board.bus_servo_set_position(1, [[1, 500], [2, 500]])
     time.sleep(1)
@@ -573,6 +814,8 @@ def pwm_servo_test(board):
     print('position:', board.pwm_servo_read_position(servo_id))
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        sys.exit(bench_main(sys.argv[2:]))       # JHC: no hardware needed
     board = Board()
     board.enable_reception()
     print("START...")
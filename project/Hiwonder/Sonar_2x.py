@@ -1,5 +1,6 @@
 import sys
 import time
+import threading
 from smbus2 import SMBus, i2c_msg
 
 # 幻尔科技iic超声波库
@@ -32,6 +33,16 @@ class Sonar:
         self.Pixels = [0,0]
         self.RGBMode = 0
 
+        # JHC: one bus handle kept open (reopened after any error)
+        self.bus = None
+        self.lock = threading.Lock()
+        self.shown = None              # JHC: pixel colors last written
+
+        # JHC: per-operation I2C counts and latency: [calls, secs, max secs]
+        self.stats = {}
+        self.skipped = 0
+        self.errors = 0
+
     def __getattr(self, attr):
         if attr in self.__units:
             return self.__units[attr]
@@ -40,32 +51,76 @@ class Sonar:
         else:
             raise AttributeError('Unknow attribute : %s'%attr)
 
+    # JHC: run fcn(bus) on persistent handle and time it
+    def transfer(self, op, fcn):
+        with self.lock:
+            t0 = time.monotonic()
+            try:
+                if self.bus is None:
+                    self.bus = SMBus(self.i2c)
+                ans = fcn(self.bus)
+            except OSError:
+                self.errors += 1
+                self.close()
+                raise
+            dt = time.monotonic() - t0
+            st = self.stats.get(op)
+            if st is None:
+                st = [0, 0.0, 0.0]
+                self.stats[op] = st
+            st[0] += 1
+            st[1] += dt
+            st[2] = max(st[2], dt)
+            return ans
+
+    # JHC: release bus handle (next transfer reopens it)
+    def close(self):
+        if self.bus is not None:
+            try:
+                self.bus.close()
+            except OSError:
+                pass
+            self.bus = None
+
+    # JHC: I2C traffic summary (latencies in secs)
+    def i2c_stats(self):
+        with self.lock:
+            ops = {op: {'calls': n, 'avg': t / max(1, n), 'max': tmax}
+                   for op, (n, t, tmax) in self.stats.items()}
+        return {'ops': ops, 'skipped': self.skipped, 'errors': self.errors}
+
     def setRGBMode(self, mode):
         try:
-            with SMBus(self.i2c) as bus:
-                bus.write_byte_data(self.i2c_addr, self.__RGB_MODE, mode)
+            self.transfer('mode', lambda bus: bus.write_byte_data(self.i2c_addr, self.__RGB_MODE, mode))
+            self.RGBMode = mode
+            self.shown = None          # JHC: firmware may not keep colors
         except BaseException as e:
             print(e)
 
-    def show(self): #占位，与扩展板RGB保持调用一致
-        pass
+    # JHC: now actually sends colors (all 6 registers in one block write)
+    # skipped entirely if neither pixel has changed since last time
+    def show(self):
+        if self.Pixels == self.shown:
+            self.skipped += 1
+            return
+        vals = []
+        for color in self.Pixels:
+            vals += [0xFF & (color >> 16), 0xFF & (color >> 8), 0xFF & color]
+        try:
+            self.transfer('rgb', lambda bus: bus.write_i2c_block_data(self.i2c_addr, self.__RGB1_R, vals))
+            self.shown = list(self.Pixels)
+        except BaseException as e:
+            print(e)
 
     def numPixels(self):
         return 2
 
+    # JHC: only records color, show() sends it (like expansion board RGB)
     def setPixelColor(self, index, rgb):
         color = (rgb[0] << 16) | (rgb[1] << 8) | rgb[2]
-        try:
-            if index != 0 and index != 1:
-                return 
-            start_reg = 3 if index == 0 else 6
-            with SMBus(self.i2c) as bus:
-                bus.write_byte_data(self.i2c_addr, start_reg, 0xFF & (color >> 16))
-                bus.write_byte_data(self.i2c_addr, start_reg+1, 0xFF & (color >> 8))
-                bus.write_byte_data(self.i2c_addr, start_reg+2, 0xFF & color)
-                self.Pixels[index] = color
-        except BaseException as e:
-            print(e)
+        if index != 0 and index != 1:
+            return
+        self.Pixels[index] = color
 
     def getPixelColor(self, index):
         if index != 0 and index != 1:
@@ -82,11 +137,25 @@ class Sonar:
                 return
             start_reg = 9 if index == 0 else 12
             cycle = int(cycle / 100)
-            with SMBus(self.i2c) as bus:
-                bus.write_byte_data(self.i2c_addr, start_reg + rgb, cycle)
+            self.transfer('breath', lambda bus: bus.write_byte_data(self.i2c_addr, start_reg + rgb, cycle))
         except BaseException as e:
             print(e)
 
+    # JHC: let firmware breathe both pixels in some color (cycle in ms)
+    # channels which are zero in color stay off, cycle regs set one at a
+    # time like setBreathCycle, color sent only once breathing so no flash
+    def setBreathing(self, rgb, cycle):
+        try:
+            for reg in range(6):
+                val = int(cycle / 100) if rgb[reg % 3] > 0 else 0
+                self.transfer('breath', lambda bus: bus.write_byte_data(self.i2c_addr, self.__RGB1_R_BREATHING_CYCLE + reg, val))
+        except BaseException as e:
+            print(e)
+        self.setRGBMode(1)
+        self.setPixelColor(0, rgb)
+        self.setPixelColor(1, rgb)
+        self.show()
+
     def startSymphony(self):
         self.setRGBMode(1)
         self.setBreathCycle(1,0, 2000)
@@ -99,14 +168,16 @@ class Sonar:
     def getDistance(self):
         dist = 99999
         try:
-            with SMBus(self.i2c) as bus:
+            def rd(bus):
                 msg = i2c_msg.write(self.i2c_addr, [0,])
                 bus.i2c_rdwr(msg)
                 read = i2c_msg.read(self.i2c_addr, 2)
                 bus.i2c_rdwr(read)
-                dist = int.from_bytes(bytes(list(read)), byteorder='little', signed=False)
-                if dist > 5000:
-                    dist = 5000
+                return read
+            read = self.transfer('dist', rd)
+            dist = int.from_bytes(bytes(list(read)), byteorder='little', signed=False)
+            if dist > 5000:
+                dist = 5000
         except BaseException as e:
             print(e)
         return dist
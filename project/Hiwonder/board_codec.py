@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+# JHC: frame encode/decode and CRC for expansion board serial protocol
+# split out of Board_25.py so it can be benchmarked without pyserial
+# frame = 0xAA 0x55 Function Length Data Checksum (CRC-8 over Function..Data)
+import os
+import sys
+import enum
+import time
+import struct
+import random
+
+class PacketFunction(enum.IntEnum):
+    # 可通过串口实现的控制功能
+    PACKET_FUNC_SYS = 0
+    PACKET_FUNC_LED = 1  # LED控制
+    PACKET_FUNC_BUZZER = 2  # 蜂鸣器控制
+    PACKET_FUNC_MOTOR = 3  # 电机控制
+    PACKET_FUNC_PWM_SERVO = 4  # PWM舵机控制, 板子上从里到外依次为1-4
+    PACKET_FUNC_BUS_SERVO = 5  # 总线舵机控制
+    PACKET_FUNC_KEY = 6  # 按键获取
+    PACKET_FUNC_IMU = 7  # IMU获取
+    PACKET_FUNC_GAMEPAD = 8  # 手柄获取
+    PACKET_FUNC_SBUS = 9  # 航模遥控获取
+    PACKET_FUNC_OLED = 10 # OLED 显示内容设置
+    PACKET_FUNC_RGB = 11 # 设置RGB颜色
+    PACKET_FUNC_NONE = 12
+
+crc8_table = [
+    0, 94, 188, 226, 97, 63, 221, 131, 194, 156, 126, 32, 163, 253, 31, 65,
+    157, 195, 33, 127, 252, 162, 64, 30, 95, 1, 227, 189, 62, 96, 130, 220,
+    35, 125, 159, 193, 66, 28, 254, 160, 225, 191, 93, 3, 128, 222, 60, 98,
+    190, 224, 2, 92, 223, 129, 99, 61, 124, 34, 192, 158, 29, 67, 161, 255,
+    70, 24, 250, 164, 39, 121, 155, 197, 132, 218, 56, 102, 229, 187, 89, 7,
+    219, 133, 103, 57, 186, 228, 6, 88, 25, 71, 165, 251, 120, 38, 196, 154,
+    101, 59, 217, 135, 4, 90, 184, 230, 167, 249, 27, 69, 198, 152, 122, 36,
+    248, 166, 68, 26, 153, 199, 37, 123, 58, 100, 134, 216, 91, 5, 231, 185,
+    140, 210, 48, 110, 237, 179, 81, 15, 78, 16, 242, 172, 47, 113, 147, 205,
+    17, 79, 173, 243, 112, 46, 204, 146, 211, 141, 111, 49, 178, 236, 14, 80,
+    175, 241, 19, 77, 206, 144, 114, 44, 109, 51, 209, 143, 12, 82, 176, 238,
+    50, 108, 142, 208, 83, 13, 239, 177, 240, 174, 76, 18, 145, 207, 45, 115,
+    202, 148, 118, 40, 171, 245, 23, 73, 8, 86, 180, 234, 105, 55, 213, 139,
+    87, 9, 235, 181, 54, 104, 138, 212, 149, 203, 41, 119, 244, 170, 72, 22,
+    233, 183, 85, 11, 136, 214, 52, 106, 43, 117, 151, 201, 74, 20, 246, 168,
+    116, 42, 200, 150, 21, 75, 169, 247, 182, 232, 10, 84, 215, 137, 107, 53
+]
+
+def checksum_crc8_bitwise(data):
+    # JHC: table-free Maxim CRC-8 (reflected 0x31), only to check the table
+    check = 0
+    for b in data:
+        check ^= b
+        for _ in range(8):
+            check = (check >> 1) ^ 0x8C if check & 1 else check >> 1
+    return check
+
+def checksum_crc8_at(check, buf, start, stop, tab=crc8_table):
+    # JHC: continue a CRC over part of a buffer without copying the frame
+    # same per-byte loop as checksum_crc8 (a 64K two-byte table over 16 bit
+    # words measured slower in CPython for frames of 4-40 bytes)
+    for b in buf[start:stop]:
+        check = tab[check ^ b]
+    return check
+
+def checksum_crc8(data, tab=crc8_table):
+    # 校验
+    check = 0
+    for b in data:
+        check = tab[check ^ b]
+    return check
+
+def encode_packet(func, data):
+    # JHC: full packet as built by original buf_write (general commands)
+    buf = [0xAA, 0x55, int(func)]
+    buf.append(len(data))
+    buf.extend(data)
+    buf.append(checksum_crc8(bytes(buf[2:])))
+    return buf
+
+def decode_frames(buf, st=None):
+    # JHC: finds all complete frames in buffer (CRC checked once per frame)
+    # returns list of (function, data) and number of leading bytes consumed
+    # optional st gets frames_in, crc_fails, resyncs, and junk counts
+    frames = []
+    i, end = 0, len(buf)
+    while True:
+        j = buf.find(b'\xAA\x55', i)
+        if j < 0:
+            # a trailing 0xAA might start the next frame (unless already used)
+            j = end - 1 if end - 1 >= i and buf[end - 1] == 0xAA else end
+        if j > i and st is not None:
+            st.resyncs += 1
+            st.junk += j - i
+        if j >= end - 1:
+            return frames, j
+        i = j
+        if end - i < 5:
+            return frames, i
+        func, n = buf[i + 2], buf[i + 3]
+        if func >= PacketFunction.PACKET_FUNC_NONE:
+            i += 2                             # not a real header
+            continue
+        stop = i + 4 + n
+        if stop >= end:
+            return frames, i
+        if checksum_crc8_at(0, buf, i + 2, stop) == buf[stop]:
+            frames.append((func, bytes(buf[i + 4:stop])))
+            if st is not None:
+                st.frames_in += 1
+            i = stop + 1
+        else:
+            if st is not None:
+                st.crc_fails += 1              # was print("校验失败")
+            i += 2                             # resync after bad header
+
+# JHC: sample payloads per function for benchmark
+# commands are host to board (encode), reports are board to host (decode)
+BENCH_CMDS = {
+    PacketFunction.PACKET_FUNC_LED: struct.pack("<BHHH", 1, 100, 900, 1),
+    PacketFunction.PACKET_FUNC_BUZZER: struct.pack("<HHHH", 523, 200, 0, 0),
+    PacketFunction.PACKET_FUNC_MOTOR: bytes([0x05, 4]) + struct.pack("<" + "Bf" * 4, 0, -30.0, 1, 30.0, 2, -30.0, 3, 30.0),
+    PacketFunction.PACKET_FUNC_PWM_SERVO: struct.pack("<BHB" + "BH" * 5, 0x01, 500, 5, 6, 1500, 5, 1600, 4, 1400, 3, 1550, 1, 1700),
+    PacketFunction.PACKET_FUNC_BUS_SERVO: struct.pack("<BHB" + "BH" * 2, 0x01, 500, 2, 1, 500, 2, 500),
+    PacketFunction.PACKET_FUNC_OLED: bytes([1, 15]) + b"SSID:HW-ABC123\0",
+    PacketFunction.PACKET_FUNC_RGB: bytes([0x01, 2]) + struct.pack("<" + "BBBB" * 2, 0, 0, 64, 127, 1, 0, 64, 127)
+}
+BENCH_REPORTS = {
+    PacketFunction.PACKET_FUNC_SYS: struct.pack("<BH", 0x04, 7800),
+    PacketFunction.PACKET_FUNC_PWM_SERVO: struct.pack("<BBH", 6, 0x05, 1500),
+    PacketFunction.PACKET_FUNC_BUS_SERVO: struct.pack("<BBbh", 1, 0x05, 0, 500),
+    PacketFunction.PACKET_FUNC_KEY: bytes([1, 0x20]),
+    PacketFunction.PACKET_FUNC_IMU: struct.pack("<6f", 0.01, -0.02, 0.98, 0.3, -0.2, 0.5),
+    PacketFunction.PACKET_FUNC_GAMEPAD: struct.pack("<HB4b", 0x0100, 0, 10, -10, 0, 0),
+    PacketFunction.PACKET_FUNC_SBUS: struct.pack("<16hBBBB", *([1000] * 16), 0, 0, 0, 0)
+}
+
+def _ref_work(data=bytes(range(32))):
+    # JHC: fixed pure-Python byte loop every test is compared against
+    x = 0
+    for b in data:
+        x ^= b
+    return x
+
+def _per_call(fn, n, div=1):
+    # fastest of many short runs in microseconds per call (divided by div)
+    # plus ratio to reference work timed right alongside (cancels host speed)
+    # runs are short so most escape preemption even on a busy machine
+    chunk = max(1, min(n, 200 // div))
+    best, ref = None, None
+    for _ in range(max(3, n // chunk)):
+        t0 = time.perf_counter()
+        for _ in range(chunk):
+            _ref_work()
+        t1 = time.perf_counter()
+        for _ in range(chunk):
+            fn()
+        t2 = time.perf_counter()
+        best = t2 - t1 if best is None else min(best, t2 - t1)
+        ref = t1 - t0 if ref is None else min(ref, t1 - t0)
+    return 1e6 * best / (chunk * div), best / (ref * div)
+
+def codec_bench(n=20000, frames=500):
+    # JHC: encode and decode cost per packet function (no hardware needed)
+    # returns (results, errors) where results maps test name to
+    # (microseconds, ratio to reference work)
+    res, errs = {}, []
+    name = lambda f: PacketFunction(f).name[12:].lower()
+
+    # encode: same list path Board uses for every command
+    for func, data in BENCH_CMDS.items():
+        res['enc_' + name(func)] = _per_call(lambda: encode_packet(func, data), n)
+
+    # decode: stream of back-to-back reports (per frame cost)
+    for func, data in BENCH_REPORTS.items():
+        stream = bytearray(bytes(encode_packet(func, data)) * frames)
+        got, used = decode_frames(stream)
+        if len(got) != frames or used != len(stream) or got[0] != (func, data):
+            errs.append(name(func) + " reports not decoded correctly")
+        res['dec_' + name(func)] = _per_call(lambda: decode_frames(stream), max(1, n // frames), frames)
+
+    # frame whose CRC byte is 0xAA must not be mistaken for a next header
+    key = PacketFunction.PACKET_FUNC_KEY
+    pkt = next(p for p in (bytes(encode_packet(key, bytes([1, k]))) for k in range(256)) if p[-1] == 0xAA)
+    if decode_frames(pkt)[1] != len(pkt):
+        errs.append("frame ending in 0xAA not fully consumed")
+
+    # CRC: check table against bitwise definition then time typical frame body
+    body = bytes(encode_packet(PacketFunction.PACKET_FUNC_IMU, BENCH_REPORTS[PacketFunction.PACKET_FUNC_IMU]))[2:-1]
+    for k in range(64):
+        rnd = bytes(random.getrandbits(8) for _ in range(k))
+        ref = checksum_crc8_bitwise(rnd)
+        if checksum_crc8(rnd) != ref or checksum_crc8_at(0, rnd, 0, k) != ref:
+            errs.append("crc mismatch at length %d" % k)
+            break
+    res['crc_imu'] = _per_call(lambda: checksum_crc8(body), n)
+    return res, errs
+
+# JHC: committed cost of each test relative to reference work (see _per_call)
+# ratios hardly depend on machine so any host can check against them
+BENCH_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "board_codec_bench.json")
+BENCH_SLACK = 2.0
+
+def bench_main(args):
+    # JHC: "python board_codec.py [baseline.json] [save]"
+    # baseline defaults to BENCH_BASE, "save" replaces it with this run
+    # exits non-zero on wrong encodings or any ratio over BENCH_SLACK x baseline
+    import json
+    path = next((a for a in args if a != "save"), BENCH_BASE)
+    res, errs = codec_bench()
+    for key, (us, rel) in res.items():
+        print("  %-16s %6.2f us  %5.2fx ref" % (key, us, rel))
+    if "save" in args:
+        with open(path, 'w') as f:
+            json.dump({k: round(rel, 3) for k, (us, rel) in res.items()}, f, indent=1)
+            f.write("\n")
+    elif os.path.isfile(path):
+        with open(path, 'r') as f:
+            base = json.load(f)
+        for key, (us, rel) in res.items():
+            if key in base and rel > BENCH_SLACK * base[key]:
+                errs.append("%s slower: %4.2fx vs %4.2fx ref" % (key, rel, base[key]))
+    else:
+        errs.append("no baseline " + path)
+    for e in errs:
+        print(">>> " + e)
+    return 1 if errs else 0
+
+if __name__ == "__main__":
+    sys.exit(bench_main(sys.argv[1:]))
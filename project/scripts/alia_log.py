@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# alia_log.py : record and replay full ALIA input/output stream
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import numpy as np, os, sys, json, struct, time
+from ctypes import c_ubyte
+
+
+# log directory contents (all raw little-endian, memory-mappable):
+#   meta.json  = record layout and frame shapes
+#   cycles.bin = one fixed-size record per Think() call
+#   color.bin  = raw 480x640x3 color frames in order received
+#   range.bin  = raw 100x100 uint16 range frames in order received
+#   text.bin   = (cycle, kind, ms, len) header + utf-8 bytes per utterance
+
+COL_SHAPE = (480, 640, 3)
+RNG_SHAPE = (100, 100)
+TXT_HDR   = struct.Struct('<IBfH')           # cycle, kind, ms, length
+
+SPIN  = 0                                    # text into reasoner
+SPOUT = 1                                    # text out of reasoner
+
+
+# get per-cycle record layout given sensor and command snapshot types
+
+def cycle_dtype(sdt, cdt):
+  return np.dtype([('t', '<f8'), ('think', '<f4'), ('rc', '<i4'),
+                   ('col', '<i4'), ('rng', '<i4'), ('sen', sdt), ('cmd', cdt)])
+
+
+# -------------------------------------------------------------------------
+
+# records every Think() cycle of reasoner inputs and outputs
+# frames are stored when received and tagged on the next cycle record
+# Note: needs inline AliaVis since AliaProc.Think() does not wait for result
+
+class AliaRec:
+
+  # initialize state (takes reasoner wrapper for snapshot layouts)
+  # color frames can be thinned by only keeping every Nth one
+  def __init__(self, path, ai, every =1):
+    os.makedirs(path, exist_ok=True)
+    self.path  = path
+    self.every = max(1, every)
+    self.rec   = np.zeros(1, cycle_dtype(ai.sen.dtype, ai.cmd.dtype))
+    meta = {'version': 1, 'sen': ai.sen.dtype.descr, 'cmd': ai.cmd.dtype.descr,
+            'col': COL_SHAPE, 'rng': RNG_SHAPE}
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+      json.dump(meta, f)
+
+    # output files
+    self.fcyc = open(os.path.join(path, 'cycles.bin'), 'wb')
+    self.fcol = open(os.path.join(path, 'color.bin'), 'wb')
+    self.frng = open(os.path.join(path, 'range.bin'), 'wb')
+    self.ftxt = open(os.path.join(path, 'text.bin'), 'wb')
+
+    # counts and pending frames
+    self.cyc  = 0
+    self.ncol = 0
+    self.nrng = 0
+    self.seen = 0
+    self.col  = -1
+    self.rng  = -1
+    self.t0   = 0.0
+
+
+  # -----------------------------------------------------------------------
+
+  # save a color frame given its memory address
+
+  def Color(self, ptr):
+    self.seen += 1
+    if (self.seen % self.every) != 0:
+      return
+    self.fcol.write((c_ubyte * (480 * 640 * 3)).from_address(ptr))
+    self.col = self.ncol
+    self.ncol += 1
+
+
+  # save a range frame given its memory address
+
+  def Range(self, ptr):
+    self.frng.write((c_ubyte * (100 * 100 * 2)).from_address(ptr))
+    self.rng = self.nrng
+    self.nrng += 1
+
+
+  # save text passed to Spin (kind = SPIN) or from Spout (kind = SPOUT)
+  # input goes with upcoming Think(), output with the one that produced it
+
+  def Text(self, kind, txt, ms =0):
+    b = txt.encode()
+    cyc = self.cyc - 1 if kind == SPOUT else self.cyc
+    self.ftxt.write(TXT_HDR.pack(max(0, cyc), kind, ms, len(b)))
+    self.ftxt.write(b)
+
+
+  # note sensor snapshot going into reasoner (call just before Think)
+
+  def Inputs(self, ai):
+    ai.GetSens()
+    self.rec['sen'] = ai.sen
+    self.t0 = time.perf_counter()
+
+
+  # note command snapshot coming out of reasoner (call just after Think)
+
+  def Outputs(self, ai, rc):
+    r = self.rec[0]
+    r['think'] = time.perf_counter() - self.t0
+    ai.GetCmds()
+    self.rec['cmd'] = ai.cmd
+    r['t'], r['rc'] = time.time(), rc
+    r['col'], r['rng'] = self.col, self.rng
+    self.fcyc.write(self.rec.tobytes())
+    self.col, self.rng = -1, -1
+    self.cyc += 1
+
+
+  # finish all files
+
+  def Close(self):
+    for f in (self.fcyc, self.fcol, self.frng, self.ftxt):
+      f.close()
+    print("Logged %d cycles (%d color, %d range) to %s" % (self.cyc, self.ncol, self.nrng, self.path))
+
+
+# -------------------------------------------------------------------------
+
+# feeds a recorded log back into a fresh reasoner with no robot attached
+# times each Think() and counts commands and speech that differ from log
+
+class AliaPlay:
+
+  # initialize state by memory-mapping all parts of log
+  def __init__(self, path):
+    with open(os.path.join(path, 'meta.json'), 'r') as f:
+      meta = json.load(f)
+    self.sdt = np.dtype([tuple(x) for x in meta['sen']])
+    self.cdt = np.dtype([tuple(x) for x in meta['cmd']])
+    self.cyc = self.mmap(path, 'cycles.bin', cycle_dtype(self.sdt, self.cdt))
+    self.col = self.mmap(path, 'color.bin', np.uint8, COL_SHAPE)
+    self.rng = self.mmap(path, 'range.bin', np.uint16, RNG_SHAPE)
+
+    # group utterances by cycle number
+    self.txt = {}
+    with open(os.path.join(path, 'text.bin'), 'rb') as f:
+      raw = f.read()
+    i = 0
+    while i + TXT_HDR.size <= len(raw):
+      cyc, kind, ms, n = TXT_HDR.unpack_from(raw, i)
+      i += TXT_HDR.size
+      self.txt.setdefault(cyc, []).append((kind, raw[i:i + n].decode(), ms))
+      i += n
+
+
+  # map a raw file as an array of records (empty if missing)
+
+  def mmap(self, path, name, dt, shape =()):
+    fn = os.path.join(path, name)
+    if not os.path.isfile(fn) or os.path.getsize(fn) <= 0:
+      return np.zeros((0,) + shape, dt)
+    return np.memmap(fn, dt, 'r').reshape((-1,) + shape)
+
+
+  # number of recorded cycles
+
+  def Cycles(self):
+    return len(self.cyc)
+
+
+  # -----------------------------------------------------------------------
+
+  # run reasoner over log (all cycles if n <= 0)
+  # returns array of Think() times in seconds
+
+  def Run(self, ai, n =0, app ='alia_play'):
+    if ai.Reset(app, 0) <= 0:
+      print(">>> Problem with ALIA!")
+      return None
+    n = len(self.cyc) if n <= 0 else min(n, len(self.cyc))
+    snames = [nm for nm in self.sdt.names if nm in ai.sen.dtype.names]
+    cnames = [nm for nm in self.cdt.names if nm in ai.cmd.dtype.names]
+
+    # scratch frame buffers (reasoner never sees read-only mapping)
+    cbuf = np.zeros(COL_SHAPE, np.uint8)
+    rbuf = np.zeros(RNG_SHAPE, np.uint16)
+    dt = np.zeros(n)
+    self.diff, self.said, self.miss = 0, 0, 0
+
+    # feed inputs then compare outputs
+    for k in range(n):
+      r = self.cyc[k]
+      for nm in snames:
+        ai.sen[0][nm] = r['sen'][nm]
+      ai.PutSens()
+      if r['col'] >= 0 and r['col'] < len(self.col):
+        np.copyto(cbuf, self.col[r['col']])
+        ai.Col.value = cbuf.ctypes.data
+      if r['rng'] >= 0 and r['rng'] < len(self.rng):
+        np.copyto(rbuf, self.rng[r['rng']])
+        ai.Rng.value = rbuf.ctypes.data
+      said = []
+      for kind, txt, ms in self.txt.get(k, []):
+        if kind == SPIN:
+          ai.Spin(txt, int(ms))
+        else:
+          said.append(txt)
+      t0 = time.perf_counter()
+      rc = ai.Think()
+      dt[k] = time.perf_counter() - t0
+      self.compare(ai, r, cnames, said)
+      if rc <= 0:
+        dt = dt[:k + 1]
+        break
+    ai.Done(0)                         # never alter saved KB
+    return dt
+
+
+  # count command fields and utterances that differ from recording
+
+  def compare(self, ai, r, cnames, said):
+    ai.GetCmds()
+    for nm in cnames:
+      if ai.cmd[0][nm] != r['cmd'][nm]:
+        self.diff += 1
+    msg = ai.Spout()
+    if msg != '':
+      self.said += 1
+      if msg not in said:
+        self.miss += 1
+    elif said:
+      self.miss += len(said)
+
+
+  # print latency statistics and regression counts
+
+  def Report(self, dt):
+    if dt is None or len(dt) <= 0:
+      return
+    p50, p95, p99 = 1000.0 * np.percentile(dt, (50, 95, 99))
+    print("Replayed %d cycles: Think p50 = %4.2f, p95 = %4.2f, p99 = %4.2f, max = %4.2f ms"
+          % (len(dt), p50, p95, p99, 1000.0 * dt.max()))
+    print("  command fields differing = %d, utterances = %d, speech mismatches = %d"
+          % (self.diff, self.said, self.miss))
+
+
+# =========================================================================
+
+# replay a recorded log: "python alia_log.py <log_dir> [cycles]"
+
+if __name__ == "__main__":
+  from alia_vis import AliaVis
+  if len(sys.argv) < 2:
+    print("argument = log directory (plus optional cycle count)")
+    sys.exit(0)
+  n = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+  p = AliaPlay(sys.argv[1])
+  p.Report(p.Run(AliaVis(), n))
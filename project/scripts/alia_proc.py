@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# alia_proc.py : runs ALIA reasoner in a separate worker process
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import multiprocessing as mp, queue, time
+import numpy as np
+from multiprocessing import shared_memory
+from ctypes import Structure, c_int, c_void_p, c_ubyte, memmove, addressof, sizeof, memset
+
+from alia_vis import AliaVis, AliaCmds, AliaSens, alia_cmds, alia_sens, alia_dtype
+
+
+# mirror structures for reasoner variables (types from library bindings)
+
+_probe = AliaVis()
+
+class AliaCmd(Structure):
+  _fields_ = [(nm, type(getattr(_probe, nm))) for nm in alia_cmds]
+
+class AliaSen(Structure):
+  _fields_ = [(nm, type(getattr(_probe, nm))) for nm in alia_sens]
+
+
+# image sizes (bytes) for transfer buffers
+
+COL_SZ = 480 * 640 * 3                 # main color camera
+RNG_SZ = 100 * 100 * 2                 # 16 bit range image
+VIEW_SZ = 480 * 640 * 3                # marked-up camera view
+MAP_SZ = 1024 * 768 * 3                # largest debugging map
+
+
+# -------------------------------------------------------------------------
+
+# lock-free triple buffer in shared memory for one writer and one reader
+# writer always fills a slot that is neither the latest nor held by reader
+# header holds: latest slot, slot held by reader, publish count
+
+class TripleBuf:
+
+  # initialize state (must be made before worker process is forked)
+  def __init__(self, nbytes):
+    self.nbytes = nbytes
+    self.step = (nbytes + 15) & ~15
+    self.raw = mp.RawArray(c_ubyte, 16 + 3 * self.step)
+    self.hd = (c_int * 4).from_buffer(self.raw)
+    self.hd[0], self.hd[1], self.hd[2] = 0, -1, 0
+    self.base = addressof(self.raw) + 16
+    self.wr = 0
+    self.last = 0
+
+
+  # get address of some slot
+
+  def Slot(self, i):
+    return self.base + i * self.step
+
+
+  # writer picks a free slot and returns its address
+
+  def Claim(self):
+    hd = self.hd
+    for i in range(3):
+      if i != hd[0] and i != hd[1]:
+        self.wr = i
+        break
+    return self.Slot(self.wr)
+
+
+  # writer marks claimed slot as the latest one
+
+  def Publish(self):
+    self.hd[0] = self.wr
+    self.hd[2] += 1
+
+
+  # writer copies some number of bytes from an address then publishes
+
+  def Put(self, src, n =0):
+    memmove(self.Claim(), src, n if n > 0 else self.nbytes)
+    self.Publish()
+
+
+  # reader holds latest slot and returns its address
+  # returns None if nothing written yet (or nothing new if fresh > 0)
+
+  def Get(self, fresh =1):
+    hd = self.hd
+    seq = hd[2]
+    if seq == 0 or (fresh > 0 and seq == self.last):
+      return None
+    while True:
+      i = hd[0]
+      hd[1] = i
+      if hd[0] == i:                   # writer did not flip meanwhile
+        break
+    self.last = seq
+    return self.Slot(i)
+
+
+# -------------------------------------------------------------------------
+
+# body of worker process: owns ALIA library state and runs Think() loop
+# paced by parent publishing new sensor data (kick event)
+
+def alia_worker(px, app, show):
+  ai = AliaVis()
+  rc = ai.Reset(app, show)
+  if rc > 0:
+    px.info.put((rc, ai.MapW(), ai.MapH(), ai.MapT()))
+  else:
+    px.info.put((rc, 0, 0, ''))
+    return
+
+  # private buffers for debugging images
+  mn = min(ai.MapW() * ai.MapH() * 3, MAP_SZ)
+  vbuf = (c_ubyte * VIEW_SZ)()
+  mbuf = (c_ubyte * max(mn, 1))()
+  if show > 0:
+    ai.View.value = addressof(vbuf)
+    ai.Map.value  = addressof(mbuf)
+
+  # snapshot arrays have same layout as mirror structures
+  ns = ai.sen.nbytes
+  direct = []
+
+  # main exchange loop
+  while px.done.value == 0:
+    px.kick.wait(0.1)
+    px.kick.clear()
+
+    # latest sensor values and any new images
+    src = px.sx.Get(0)
+    if src is not None:
+      memmove(ai.sen.ctypes.data, src, ns)
+      ai.PutSens()
+    src = px.col.Get()
+    if src is not None:
+      ai.Col.value = src
+    src = px.rng.Get()
+    if src is not None:
+      ai.Rng.value = src
+    try:
+      while True:
+        ai.Spin(*px.spin.get_nowait())
+    except queue.Empty:
+      pass
+
+    # possibly render debugging images straight into viewer memory
+    if show > 0 and not px.ctl.empty():
+      direct = [shared_memory.SharedMemory(name=nm) for nm in px.ctl.get()]
+      ai.View.value = addressof(c_ubyte.from_buffer(direct[0].buf))
+      ai.Map.value  = addressof(c_ubyte.from_buffer(direct[1].buf))
+
+    # reason then publish commands and outputs
+    rc = ai.Think()
+    ai.GetCmds()
+    px.cx.Put(ai.cmd.ctypes.data)
+    msg = ai.Spout()
+    if msg != '':
+      px.spout.put(msg)
+    if show > 0 and not direct:
+      px.view.Put(addressof(vbuf))
+      px.map.Put(addressof(mbuf), mn)
+    px.rc.value = rc
+    px.beat.value += 1
+    if rc <= 0:
+      break
+
+  # wait for parent to decide about saving knowledge
+  while px.done.value == 0:
+    time.sleep(0.05)
+  ai.Done(px.done.value - 1)
+
+
+# -------------------------------------------------------------------------
+
+# runs ALIA reasoner in a separate worker process
+# same variable interface as AliaVis but Think() never blocks on reasoning
+# sensor and command snapshots pass through shared memory triple buffers
+# color and range frames are copied since pointers are process-specific
+# a crashed worker is restarted (reloading KB) without touching hardware
+
+class AliaProc:
+
+  # allow access to mirrored command and sensor variables
+  # read commands with ".value" and write sensors with ".value ="
+  def __init__(self, tries =3):
+    self.cbuf = AliaCmd()
+    self.sbuf = AliaSen()
+    for nm in alia_cmds:
+      setattr(self, nm, getattr(AliaCmd, nm).type.from_buffer(self.cbuf, getattr(AliaCmd, nm).offset))
+    for nm in alia_sens:
+      setattr(self, nm, getattr(AliaSen, nm).type.from_buffer(self.sbuf, getattr(AliaSen, nm).offset))
+
+    # bulk snapshot views sharing memory with mirrors (see AliaVis.GetCmds)
+    self.cmd = np.frombuffer(self.cbuf, alia_dtype(_probe, alia_cmds))
+    self.sen = np.frombuffer(self.sbuf, alia_dtype(_probe, alia_sens))
+
+    # local image pointers (same meaning as in AliaVis)
+    self.View = c_void_p()
+    self.Map  = c_void_p()
+    self.Rng  = c_void_p()
+    self.Col  = c_void_p()
+    self.Aux  = c_void_p()                         # not forwarded
+
+    # shared transfer buffers
+    self.sx   = TripleBuf(sizeof(AliaSen))
+    self.cx   = TripleBuf(sizeof(AliaCmd))
+    self.col  = TripleBuf(COL_SZ)
+    self.rng  = TripleBuf(RNG_SZ)
+    self.view = TripleBuf(VIEW_SZ)
+    self.map  = TripleBuf(MAP_SZ)
+
+    # worker status and control
+    self.rc   = mp.RawValue(c_int, 1)
+    self.beat = mp.RawValue(c_int, 0)
+    self.done = mp.RawValue(c_int, 0)
+    self.kick = mp.Event()
+    self.proc = None
+
+    # restart bookkeeping
+    self.tries = tries
+    self.fails = 0
+    self.ready = False
+    self.app   = ''
+    self.show  = 0
+    self.names = None
+    self.mw, self.mh, self.mt = 0, 0, ''
+
+
+  # -------------------------------------------------------------------------
+
+  # configure reasoning system and load knowledge base in worker process
+  # app_name: name of program to print on console at beginning
+  # show: produce debugging image (0 = none, 1 = overhead map, 2-17 = various)
+  # returns 1 if okay, 0 or negative for problem
+
+  def Reset(self, app_name, show =0):
+    self.app, self.show = app_name, show
+    self.launch()
+    try:
+      rc, self.mw, self.mh, self.mt = self.info.get(timeout=120.0)
+    except queue.Empty:
+      return -1
+    self.ready = (rc > 0)
+    return rc
+
+
+  # exchange command and sensor data then let worker reason a bit
+  # returns 2 if okay, 1 if not ready, 0 for quit, negative for problem
+
+  def Think(self):
+    if not self.ready:
+      return self.relaunch()
+
+    # post sensor snapshot and any new images (consumes pointers)
+    self.sx.Put(addressof(self.sbuf))
+    if self.Col.value:
+      self.col.Put(self.Col.value)
+      self.Col.value = None
+    if self.Rng.value:
+      self.rng.Put(self.Rng.value)
+      self.Rng.value = None
+    self.kick.set()
+
+    # get latest commands and debugging images
+    src = self.cx.Get()
+    if src is not None:
+      memmove(addressof(self.cbuf), src, sizeof(self.cbuf))
+    if self.View.value:
+      src = self.view.Get()
+      if src is not None:
+        memmove(self.View.value, src, VIEW_SZ)
+    if self.Map.value:
+      src = self.map.Get()
+      if src is not None:
+        memmove(self.Map.value, src, min(self.mw * self.mh * 3, MAP_SZ))
+
+    # check on health of worker
+    if not self.proc.is_alive():
+      return self.relaunch()
+    if self.beat.value > 0 and self.rc.value <= 0:
+      return self.rc.value
+    return 2
+
+
+  # cleanly stop reasoning system and possibly save knowledge base
+  # returns 1 if okay, 0 or negative for problem
+
+  def Done(self, save):
+    if self.proc is None:
+      return 0
+    self.done.value = 1 + save
+    self.kick.set()
+    self.proc.join(30.0)
+    if self.proc.is_alive():
+      self.proc.terminate()
+      self.proc.join()
+      return 0
+    return 1
+
+
+  # have worker draw debugging images directly into named shared memory
+  # avoids copying them through the control loop (see ImgViewer)
+
+  def Share(self, names):
+    self.names = tuple(names)
+    self.ctl.put(self.names)
+    self.View.value = None
+    self.Map.value  = None
+
+
+  # -------------------------------------------------------------------------
+
+  # snapshot of all mirrored command variables (see AliaVis.GetCmds)
+
+  def GetCmds(self):
+    return AliaCmds._make(self.cmd[0].item())
+
+
+  # overwrite mirrored command variables (or leave "cmd" as is)
+
+  def PutCmds(self, rec =None):
+    if rec is not None:
+      self.cmd[0] = rec
+
+
+  # snapshot of all mirrored sensor variables
+
+  def GetSens(self):
+    return AliaSens._make(self.sen[0].item())
+
+
+  # overwrite mirrored sensor variables (or leave "sen" as is)
+
+  def PutSens(self, rec =None):
+    if rec is not None:
+      self.sen[0] = rec
+
+
+  # -------------------------------------------------------------------------
+
+  # text output from reasoner for TTS
+
+  def Spout(self):
+    try:
+      return self.spout.get_nowait()
+    except queue.Empty:
+      return ''
+
+
+  # text input to reasoner from speech recognition
+
+  def Spin(self, reco, ms =0):
+    self.spin.put((reco, ms))
+
+
+  # -------------------------------------------------------------------------
+
+  # get width of alternate debugging "map" image (only valid after reset)
+
+  def MapW(self):
+    return self.mw
+
+
+  # get height of alternate debugging "map" image (only valid after reset)
+
+  def MapH(self):
+    return self.mh
+
+
+  # get title of alternate debugging "map" image (only valid after reset)
+
+  def MapT(self):
+    return self.mt
+
+
+  # -------------------------------------------------------------------------
+
+  # start a fresh worker process with new message queues
+
+  def launch(self):
+    self.info  = mp.Queue()
+    self.spin  = mp.Queue()
+    self.spout = mp.Queue()
+    self.ctl   = mp.Queue()
+    if self.names is not None:
+      self.ctl.put(self.names)
+    self.rc.value, self.beat.value = 1, 0
+    self.proc = mp.Process(target=alia_worker, args=(self, self.app, self.show), daemon=True)
+    self.proc.start()
+
+
+  # restart worker after a crash and poll for it to finish loading
+  # commands are zeroed meanwhile so actuators hold still
+  # returns 1 while reloading, negative if too many failures
+
+  def relaunch(self):
+    if self.proc.is_alive():
+      try:
+        rc, _, _, _ = self.info.get_nowait()
+      except queue.Empty:
+        return 1
+      self.ready = (rc > 0)
+      return 1 if self.ready else rc
+    self.fails += 1
+    print("\n\x1b[1;33m>>> ALIA worker died (%d) - restarting ...\x1b[0m" % self.proc.exitcode)
+    memset(addressof(self.cbuf), 0, sizeof(self.cbuf))
+    self.ready = False
+    if self.fails > self.tries:
+      return -1
+    self.launch()
+    return 1
@@ -25,14 +25,55 @@
 # 
 # =========================================================================
 
-import socket, time                                    
-from ctypes import CDLL, c_char_p, c_void_p, c_int, c_float
+import socket, time, sys
+import numpy as np
+from collections import namedtuple
+from ctypes import CDLL, c_char_p, c_void_p, c_int, c_float, c_uint32, addressof
       
 lib = CDLL('lib/libalia_vis.so')  
 lib.alia_spout.restype = c_char_p
 lib.alia_tmap.restype = c_char_p
 
 
+# command variables (reasoner -> body) read after Think()
+# types come from AliaVis bindings (c_int or c_float)
+
+alia_cmds = ('Attn', 'Mood',
+             'Rxt', 'Ryt', 'Rzt', 'Rpt', 'Rtt', 'Rpv', 'Rtv', 'Rgv', 'Rpi', 'Rti', 'Rgi',
+             'Cpt', 'Ctt', 'Cpv', 'Ctv', 'Cpi', 'Cti',
+             'Npt', 'Ntt', 'Npv', 'Ntv', 'Npi', 'Nti',
+             'Fht', 'Fhv', 'Fhi',
+             'Axt', 'Ayt', 'Azt', 'Apt', 'Att', 'Art', 'Awt', 
+             'Apv', 'Adv', 'Awv', 'Ajv', 'Apm', 'Adm', 'Api', 'Adi', 'Awi', 'Aji',
+             'Bmt', 'Brt', 'Bsk', 'Bmv', 'Brv', 'Bmi', 'Bri')
+
+
+# sensor variables (body -> reasoner) written before Think()
+# image buffer pointers excluded since addresses are process-specific
+
+alia_sens = ('Hear', 'Talk', 'Batt', 'Tilt', 'Roll',
+             'Rx', 'Ry', 'Rz', 'Rp', 'Rt', 'Rr',
+             'Cx', 'Cy', 'Cz', 'Cp', 'Ct', 'Cr',
+             'Nx', 'Ny', 'Nz', 'Np', 'Nt', 'Nr',
+             'Fh',
+             'Ax', 'Ay', 'Az', 'Ap', 'At', 'Ar', 'Aw', 'Af', 'Aj',
+             'Bt', 'Bw', 'Bx', 'By',
+             'Vfmt', 'Mfmt', 'Rfmt', 'Cfmt', 'Afmt')
+
+
+# immutable snapshots with named fields (fast attribute access)
+
+AliaCmds = namedtuple('AliaCmds', alia_cmds)
+AliaSens = namedtuple('AliaSens', alia_sens)
+
+
+# get NumPy structured type matching a list of bound variables
+# field layout is identical to a packed ctypes Structure of the same names
+
+def alia_dtype(ai, names):
+  return np.dtype([(nm, '<i4' if type(getattr(ai, nm)) is c_int else '<f4') for nm in names])
+
+
 # Python wrapper for ALIA linguistic reasoning system with vision
 # basically has a big pile of gettable and settable class variables
 # NOTE: either do "sudo chmod a+w KB log dump" or run with "sudo" for files
@@ -174,6 +215,29 @@ class AliaVis:
     self.Cfmt = c_int.in_dll(lib, "alia_cfmt")     # main cam data format
     self.Afmt = c_int.in_dll(lib, "alia_afmt")     # aux cam data format
 
+    # ---------------------------- SNAPSHOTS --------------------------------
+
+    # bulk copies of all command and sensor variables (see GetCmds)
+    self.cmd = np.zeros(1, alia_dtype(self, alia_cmds))
+    self.sen = np.zeros(1, alia_dtype(self, alia_sens))
+    self.bulk_init()
+
+
+  # resolve library addresses of all snapshot variables once
+  # every one is a 4 byte int or float so a single uint32 view spans them
+  # gather and scatter then become one fancy-indexing call each
+
+  def bulk_init(self):
+    ca = [addressof(getattr(self, nm)) for nm in alia_cmds]
+    sa = [addressof(getattr(self, nm)) for nm in alia_sens]
+    lo = min(ca + sa)
+    hi = max(ca + sa) + 4
+    self.span = np.ctypeslib.as_array((c_uint32 * ((hi - lo) >> 2)).from_address(lo))
+    self.cidx = np.array([(a - lo) >> 2 for a in ca], np.intp)
+    self.sidx = np.array([(a - lo) >> 2 for a in sa], np.intp)
+    self.cmd_u = self.cmd.view(np.uint32)
+    self.sen_u = self.sen.view(np.uint32)
+
   # -------------------------------------------------------------------------
 
   # configure reasoning system and load knowledge base
@@ -203,6 +267,40 @@ class AliaVis:
     return lib.alia_done(save)
 
 
+  # -------------------------------------------------------------------------
+
+  # gather all command variables into "cmd" array with a single call
+  # returns snapshot with named fields (e.g. c.Api) for cheap repeated reads
+
+  def GetCmds(self):
+    np.take(self.span, self.cidx, out=self.cmd_u)
+    return AliaCmds._make(self.cmd[0].item())
+
+
+  # scatter "cmd" array (or a given record) back to command variables 
+
+  def PutCmds(self, rec =None):
+    if rec is not None:
+      self.cmd[0] = rec
+    self.span[self.cidx] = self.cmd_u
+
+
+  # gather all sensor variables into "sen" array with a single call
+  # returns snapshot with named fields (e.g. s.Batt)
+
+  def GetSens(self):
+    np.take(self.span, self.sidx, out=self.sen_u)
+    return AliaSens._make(self.sen[0].item())
+
+
+  # scatter "sen" array (or a given record) to sensor variables
+
+  def PutSens(self, rec =None):
+    if rec is not None:
+      self.sen[0] = rec
+    self.span[self.sidx] = self.sen_u
+
+
   # -------------------------------------------------------------------------
 
   # text output from reasoner for TTS
@@ -213,7 +311,7 @@ class AliaVis:
 
   # text input to reasoner from speech recognition
 
-  def Spin(self, reco, ms):
+  def Spin(self, reco, ms =0):
     lib.alia_spin(c_char_p(reco.encode()), ms)
 
 
@@ -239,10 +337,44 @@ class AliaVis:
 
 # =========================================================================
 
-# simple test program
+# time per-cycle variable exchange using individual ctypes objects 
+# versus bulk snapshots (no KB needed since globals always exist)
+
+def bench_access(ai, n =20000):
+  cvars = [getattr(ai, nm) for nm in alia_cmds]
+  svars = [getattr(ai, nm) for nm in alia_sens]
+
+  # one ".value" read per command and one write per sensor
+  t0 = time.perf_counter()
+  for _ in range(n):
+    vals = [v.value for v in cvars]
+    for v in svars:
+      v.value = 0
+  t1 = time.perf_counter()
+
+  # single gather and single scatter
+  for _ in range(n):
+    c = ai.GetCmds()
+    ai.PutSens()
+  t2 = time.perf_counter()
+
+  # report microseconds per cycle and check both ways agree
+  each = 1e6 * (t1 - t0) / n
+  bulk = 1e6 * (t2 - t1) / n
+  print("%d cmds + %d sensors per cycle:" % (len(cvars), len(svars)))
+  print("  ctypes .value = %5.1f us" % each)
+  print("  bulk snapshot = %5.1f us (%3.1fx)" % (bulk, each / max(bulk, 1e-3)))
+  if list(c) != vals:
+    print("  >>> bulk snapshot does not match individual reads!")
+
+
+# simple test program (use argument "bench" for variable access timing)
 
 if __name__ == "__main__":
   ai = AliaVis()
+  if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+    bench_access(ai)
+    sys.exit(0)
   ai.Reset('alia_vis')
   cnt = 0
   last = '<none>'
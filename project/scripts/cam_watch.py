@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# cam_watch.py : background supervisor for color camera and TOF sensor
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import os, time
+
+from threading import Thread, Event, Lock
+
+
+# -------------------------------------------------------------------------
+
+# background supervisor for color camera and TOF sensor
+# main loop only grabs frames (never blocks) and reads published health
+# thread restarts a stale color camera (USB hub only power cycled at Boot)
+# TOF sensor cannot be restarted (needs reboot) so is just flagged
+# health values: 1 = streaming, 0 = recovering, -1 = failed
+
+class CamWatch(Thread):
+
+  # initialize state (takes camera objects and USB hub number)
+  def __init__(self, rgb, tof, hub, stale =0.5, tries =3):
+    super(CamWatch, self).__init__()
+    self.halt = Event()
+    self.lock = Lock()                 # held while restarting color camera
+    self.rgb = rgb
+    self.tof = tof
+    self.hub = hub
+
+    # freshness limit and recovery attempts before giving up
+    self.stale = stale
+    self.tries = tries
+
+    # last frame times and published health
+    self.ct = 0.0
+    self.rt = 0.0
+    self.chealth = 0
+    self.rhealth = 0
+
+    # newest range frame shared by main loop and safety layer
+    self.rlock = Lock()
+    self.rbuf = None
+    self.rseq = 0
+    self.rseen = 0                     # last one given to Range()
+
+    # recovery statistics
+    self.restarts = 0
+    self.cycles = 0
+
+
+  # -----------------------------------------------------------------------
+
+  # start color camera right now, power cycling USB hub if balky
+  # meant for startup (before audio is running) so blocks for a few secs
+  # returns 1 if okay, 0 or negative for problem
+
+  def Boot(self):
+    if self.rgb.Start() > 0:
+      return 1
+    print("\x1b[1;33m>>> Power cycling USB hub for color camera ... \x1b[0m", end='', flush=True)
+    self.power_cycle()
+    print()
+    return self.rgb.Start()
+
+
+  # begin watching both streams (call once both have started)
+
+  def Watch(self):
+    now = time.monotonic()
+    self.ct, self.rt = now, now
+    self.chealth, self.rhealth = 1, 1
+    self.start()
+
+
+  # get newest color image pointer or None (never blocks)
+
+  def Color(self):
+    if self.chealth <= 0 or not self.lock.acquire(False):
+      return None
+    try:
+      buf = self.rgb.Color(0, 0)
+    finally:
+      self.lock.release()
+    if buf is not None:
+      self.ct = time.monotonic()
+    return buf
+
+
+  # get newest range image pointer or None (never blocks)
+
+  def Range(self):
+    buf, self.rseen = self.Depth(self.rseen)
+    return buf
+
+
+  # get range image pointer newer than sequence number "seq" (never blocks)
+  # returns pointer (or None if nothing newer) and its sequence number
+  # Note: lets other threads see frames without stealing them from Range()
+
+  def Depth(self, seq =0):
+    if self.rhealth < 0:
+      return None, seq
+    with self.rlock:
+      buf = self.tof.Range(0, 0)
+      if buf is not None:
+        self.rbuf = buf
+        self.rseq += 1
+        self.rt = time.monotonic()
+      if self.rseq == seq:
+        return None, seq
+      return self.rbuf, self.rseq
+
+
+  # report current health of color camera and range sensor
+
+  def Health(self):
+    return self.chealth, self.rhealth
+
+
+  # signal thread to cleanly terminate then wait for it
+
+  def Done(self):
+    self.halt.set()
+    if self.is_alive():
+      Thread.join(self, None)
+
+
+  # -----------------------------------------------------------------------
+
+  # override Thread.run() which is called by start()
+
+  def run(self):
+    while not self.halt.is_set():
+      now = time.monotonic()
+      if self.chealth > 0 and (now - self.ct) > self.stale:
+        self.recover()
+      if self.rhealth > 0 and (now - self.rt) > self.stale:
+        print("\n\x1b[1;33m>>> TOF sensor stopped working!\x1b[0m")
+        self.rhealth = -1
+      self.halt.wait(0.05)
+
+
+  # restart color camera by just closing and reopening it
+  # never power cycles USB hub while running since that would also
+  # knock out sound card and TOF sensor (which cannot be restarted)
+
+  def recover(self):
+    print("\n\x1b[1;33m>>> Color camera restarting ...\x1b[0m")
+    self.chealth = 0
+    with self.lock:
+      for i in range(self.tries):
+        if self.halt.is_set():
+          return
+        self.restarts += 1
+        self.rgb.Done()
+        if i > 0:
+          self.halt.wait(1.0)          # give device time to settle
+        if self.rgb.Start() > 0:
+          self.ct = time.monotonic()
+          self.chealth = 1
+          return
+    print("\x1b[1;33m>>> Color camera stopped working!\x1b[0m")
+    self.chealth = -1
+
+
+  # turn USB hub off then on again and wait for devices to reappear
+
+  def power_cycle(self):
+    self.cycles += 1
+    os.system(f"sudo uhubctl -l{self.hub} -a0 > /dev/null")
+    time.sleep(1.0)
+    os.system(f"sudo uhubctl -l{self.hub} -a1 > /dev/null")
+    time.sleep(3.0)
+    os.system("pulseaudio -k")           # make sure USB sound card found
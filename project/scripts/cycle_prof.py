@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# cycle_prof.py : per-phase timing statistics for main control loop
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import time
+import numpy as np
+
+
+# -------------------------------------------------------------------------
+
+# per-phase timing statistics for main control loop
+# each cycle is one row in a fixed-size ring buffer with one column per phase
+# phases are named on first use and keep that column thereafter
+# a phase not run on some cycle (e.g. neck vs arm) is left as NaN
+
+class CycleProf:
+
+  # initialize state (takes nominal cycle time in seconds)
+  def __init__(self, cycle, size =2048, most =32):
+    self.cycle = cycle
+    self.size  = size
+    self.most  = most
+
+    # ring buffer of phase durations (secs) and column lookup
+    self.ring  = np.full((size, most), np.nan, np.float32)
+    self.names = []
+    self.col   = {}
+
+    # current row and total cycles seen
+    self.row = -1
+    self.cnt = 0
+
+    # cycles that started late and worst lateness
+    self.over  = 0
+    self.worst = 0.0
+
+
+  # -----------------------------------------------------------------------
+
+  # get current high resolution monotonic time (secs)
+
+  def Now(self):
+    return time.perf_counter()
+
+
+  # advance to a fresh row at the beginning of a new cycle
+
+  def Begin(self):
+    self.row = (self.row + 1) % self.size
+    self.ring[self.row, :] = np.nan
+    self.cnt += 1
+
+
+  # record time since "t0" under some phase name
+  # returns current time for chaining into next phase
+
+  def Lap(self, name, t0):
+    now = time.perf_counter()
+    self.Add(name, now - t0)
+    return now
+
+
+  # record a given duration (secs) under some phase name
+
+  def Add(self, name, secs):
+    if self.row < 0:
+      return
+    c = self.col.get(name)
+    if c is None:
+      if len(self.names) >= self.most:
+        return
+      c = len(self.names)
+      self.col[name] = c
+      self.names.append(name)
+    self.ring[self.row, c] = secs
+
+
+  # note that cycle started late by some amount (secs)
+
+  def Overrun(self, late):
+    self.over += 1
+    self.worst = max(self.worst, late)
+
+
+  # -----------------------------------------------------------------------
+
+  # get p50, p95, p99, and max (ms) for some phase
+  # returns None if phase never run in current buffer
+
+  def Stats(self, name):
+    c = self.col.get(name)
+    if c is None:
+      return None
+    n = min(self.cnt, self.size)
+    v = self.ring[:n, c]
+    v = v[~np.isnan(v)]
+    if v.size <= 0:
+      return None
+    p50, p95, p99 = np.percentile(v, (50, 95, 99))
+    return 1000.0 * p50, 1000.0 * p95, 1000.0 * p99, 1000.0 * v.max()
+
+
+  # get counts of cycles taking < 25%, < 50%, < 100%, and >= 100% of budget
+  # judged by sum of all top-level phases given
+
+  def Budget(self, top):
+    n = min(self.cnt, self.size)
+    cols = [self.col[nm] for nm in top if nm in self.col]
+    if n <= 0 or not cols:
+      return 0, 0, 0, 0
+    tot = np.nansum(self.ring[:n, cols], axis=1) / self.cycle
+    h, _ = np.histogram(tot, (0.0, 0.25, 0.5, 1.0, np.inf))
+    return tuple(int(x) for x in h)
+
+
+  # print summary table of all phases in order first seen
+  # "top" lists phases that together make up a full cycle
+
+  def Report(self, top =()):
+    n = min(self.cnt, self.size)
+    if n <= 0:
+      return
+    print("Cycle timing over last %d of %d cycles (budget %3.1f ms):"
+          % (n, self.cnt, 1000.0 * self.cycle))
+    print("  %-12s %7s %7s %7s %7s" % ("phase", "p50", "p95", "p99", "max"))
+    for nm in self.names:
+      s = self.Stats(nm)
+      if s is not None:
+        print("  %-12s %7.2f %7.2f %7.2f %7.2f" % (nm, *s))
+    if top:
+      print("  load: <25%% = %d, <50%% = %d, <100%% = %d, over = %d" % self.Budget(top))
+    print("  overruns = %d (%3.1f%%), worst late = %3.1f ms"
+          % (self.over, 100.0 * self.over / self.cnt, 1000.0 * self.worst))
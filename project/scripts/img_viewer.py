@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# img_viewer.py : shows debugging images from a separate viewer process
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import multiprocessing as mp, numpy as np, os, socket, cv2
+from multiprocessing import shared_memory
+
+
+# body of viewer process: attach to image buffers and redisplay periodically
+# only this process ever touches the GUI
+
+def viewer_loop(cname, mname, mw, mh, title, hz, stop):
+  cshm = shared_memory.SharedMemory(name=cname)
+  mshm = shared_memory.SharedMemory(name=mname)
+  cam = np.ndarray((480, 640, 3), np.uint8, buffer=cshm.buf)
+  map = np.ndarray((mh, mw, 3), np.uint8, buffer=mshm.buf)
+
+  # object detection (color camera)
+  cv2.namedWindow("Camera View", flags=cv2.WINDOW_GUI_NORMAL)
+  cv2.resizeWindow("Camera View", 640, 480)
+  cv2.moveWindow("Camera View", 0, 0)
+  cv2.imshow("Camera View", cam)
+
+  # debugging image (ALIA sets size)
+  cv2.namedWindow("Overhead Map", flags=cv2.WINDOW_GUI_NORMAL)
+  cv2.resizeWindow("Overhead Map", mw, mh)
+  cv2.setWindowTitle("Overhead Map", title)
+  cv2.moveWindow("Overhead Map", 650, 0)                 # ignores!
+  cv2.imshow("Overhead Map", map)
+
+  # needs >200ms for fill and initialization
+  # to regrab terminal needs: sudo apt install wmctrl
+  cv2.waitKey(500);
+  cv2.moveWindow("Overhead Map", 650, 0)                 # works here
+  cv2.moveWindow("Camera View", 0, 0)
+  term = os.getlogin() + "@" + socket.gethostname()
+  os.system("wmctrl -a " + term)                         # reclaim keyboard
+
+  # redisplay at own rate until told to stop
+  wait = max(1, int(1000.0 / hz))
+  while not stop.is_set():
+    cv2.imshow("Camera View", cam)
+    cv2.imshow("Overhead Map", map)
+    cv2.waitKey(wait)                                    # also paces loop
+  cv2.destroyAllWindows()
+  del cam, map
+  cshm.close()
+  mshm.close()
+
+
+# -------------------------------------------------------------------------
+
+# shows debugging images from a separate viewer process
+# reasoner renders straight into shared memory images "cam" and "map"
+# so the control loop pays nothing for display
+
+class ImgViewer:
+
+  # create shared images and start viewer (map size from ALIA)
+  def __init__(self, mw, mh, title, hz =10.0):
+    self.cshm = shared_memory.SharedMemory(create=True, size=480 * 640 * 3)
+    self.mshm = shared_memory.SharedMemory(create=True, size=mw * mh * 3)
+    self.cam = np.ndarray((480, 640, 3), np.uint8, buffer=self.cshm.buf)
+    self.map = np.ndarray((mh, mw, 3), np.uint8, buffer=self.mshm.buf)
+    self.cam[:] = (255, 0, 0)                              # blue
+    self.map[:] = (0, 128, 0)                              # green
+
+    # launch display process
+    self.stop = mp.Event()
+    self.proc = mp.Process(target=viewer_loop, daemon=True,
+                           args=(self.cshm.name, self.mshm.name, mw, mh, title, hz, self.stop))
+    self.proc.start()
+
+
+  # names of shared camera view and map buffers (for other processes)
+
+  def Names(self):
+    return self.cshm.name, self.mshm.name
+
+
+  # stop viewer and release shared memory
+
+  def Done(self):
+    self.stop.set()
+    self.proc.join(2.0)
+    if self.proc.is_alive():
+      self.proc.terminate()
+    del self.cam, self.map
+    for shm in (self.cshm, self.mshm):
+      shm.close()
+      shm.unlink()
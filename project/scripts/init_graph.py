@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# init_graph.py : runs startup steps concurrently respecting dependencies
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import time
+
+from threading import Thread, Event
+
+
+# -------------------------------------------------------------------------
+
+# one startup activity: function returning > 0 if okay plus prerequisites
+
+class InitStep:
+
+  # initialize state
+  def __init__(self, name, fcn, deps):
+    self.name = name
+    self.fcn  = fcn
+    self.deps = tuple(deps)
+    self.done = Event()
+    self.rc   = 0                      # 0 = skipped or failed
+    self.t0   = 0.0
+    self.t1   = 0.0
+
+
+# -------------------------------------------------------------------------
+
+# runs startup steps concurrently respecting declared dependencies
+# each step gets its own thread which waits for all its prerequisites
+# a step whose prerequisite failed is skipped (result 0)
+
+class InitGraph:
+
+  # initialize state
+  def __init__(self):
+    self.steps = {}
+    self.order = []
+    self.start = 0.0
+
+
+  # declare a step (function returns > 0 if okay) and steps it needs first
+
+  def Add(self, name, fcn, deps =()):
+    self.steps[name] = InitStep(name, fcn, deps)
+    self.order.append(name)
+
+
+  # run all steps and wait for them to finish
+  # returns total elapsed seconds
+
+  def Run(self):
+    self.start = time.monotonic()
+    th = [Thread(target=self.run_step, args=(self.steps[nm],)) for nm in self.order]
+    for t in th:
+      t.start()
+    for t in th:
+      t.join()
+    return max((s.t1 for s in self.steps.values()), default=self.start) - self.start
+
+
+  # tell result code of some step (0 if skipped or never declared)
+
+  def Result(self, name):
+    s = self.steps.get(name)
+    return s.rc if s is not None else 0
+
+
+  # wait for prerequisites then run one step and time it
+
+  def run_step(self, s):
+    for d in s.deps:
+      self.steps[d].done.wait()
+    s.t0 = time.monotonic()
+    if all(self.steps[d].rc > 0 for d in s.deps):
+      try:
+        s.rc = s.fcn()
+      except Exception as e:
+        print("\n\x1b[1;33m>>> Startup step %s failed: %s\x1b[0m" % (s.name, e))
+        s.rc = -1
+      if s.rc is None:
+        s.rc = 1                       # plain procedure
+    s.t1 = time.monotonic()
+    s.done.set()
+
+
+  # -----------------------------------------------------------------------
+
+  # get chain of steps ending at some step that determined its start time
+
+  def chain(self, name):
+    path = []
+    while name is not None:
+      path.insert(0, name)
+      deps = self.steps[name].deps
+      name = max(deps, key=lambda d: self.steps[d].t1) if deps else None
+    return path
+
+
+  # print start and end of every step plus the critical path
+
+  def Report(self):
+    if not self.order:
+      return
+    print("Startup steps (secs from start):")
+    for nm in self.order:
+      s = self.steps[nm]
+      print("  %-8s %5.2f -> %5.2f  (%5.2f)%s" % (nm, s.t0 - self.start, s.t1 - self.start,
+            s.t1 - s.t0, "" if s.rc > 0 else "  FAILED"))
+    last = max(self.order, key=lambda nm: self.steps[nm].t1)
+    path = self.chain(last)
+    print("  critical path: " + " -> ".join("%s (%3.1f)" % (nm, self.steps[nm].t1 - self.steps[nm].t0)
+                                            for nm in path))
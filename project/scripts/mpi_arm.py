@@ -104,7 +104,8 @@ def sine_law(a, b_int, b):
 class MpiArm:
 
   # initialize state (takes robot interface object as argument)
-  def __init__(self, mpi):
+  # servo posing can be deferred (pose = 0) then done later with Startup()
+  def __init__(self, mpi, pose =1):
     self.bot = mpi
     self.bot.LoadCal()                 # servo calibration data
 
@@ -166,7 +167,14 @@ class MpiArm:
 
     # send command to servos but don't wait for completion
     self.Rate(30)
-    self.init_servos(b, s, e, w, g)                
+    if pose > 0:
+      self.init_servos(b, s, e, w, g)                
+
+
+  # move power-on servos to starting pose (if deferred in constructor)
+
+  def Startup(self):
+    self.init_servos(self.bc, self.sc, self.ec, self.wc, self.gc)
 
 
   # power-on servos have unknown postions so move one at a time (4 sec)
@@ -104,9 +104,16 @@ class MpiBase:
         self.dr += 360    
     self.wind += self.dr;              # cumulative turn
     self.ccw0 = ccw                     
-    self.imu = True                    # never resets
+    self.imu = True                    # until NoCompass
    
 
+  # go back to estimating rotation from wheel speeds (e.g. IMU stale)
+  # next Compass call then starts over from the heading it gives
+
+  def NoCompass(self):
+    self.imu = False
+
+
   # directly set the robot's map position (e.g. from SLAM)
   # heading of 0 points along x axis, 90 points along y axis
   # sets values "dm", "trav", "mx", and "my"
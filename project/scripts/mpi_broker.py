@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# mpi_broker.py : lets several programs share MasterPi expansion board
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import os, sys, time, socket, struct, signal, serial, _thread
+
+from threading import Thread, Lock, Event
+from queue import PriorityQueue
+
+sys.path.append('/home/pi/Ganbei/Hiwonder')
+from Board_25 import Board
+
+
+# client to broker message = (priority, length) header then raw packets
+# broker to client stream = raw bytes exactly as received from board
+
+BROKER = "/tmp/mpi_board.sock"
+MSG    = struct.Struct('<BH')
+URGENT = 3                             # priority of Freeze and servo reads
+
+
+# -------------------------------------------------------------------------
+
+# socket stand-in for serial port used by Board when broker is running
+# Board then parses broker's copy of all board reports itself
+# losing the broker interrupts main thread since robot is then uncontrolled
+
+class SockPort:
+
+  # connect to broker (raises exception if not running)
+  def __init__(self, path =BROKER, prio =1):
+    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self.sock.connect(path)
+    self.prio = prio
+    self.lock = Lock()
+    self.in_waiting = 0                # Board then blocks in read
+    self.is_open = True
+
+
+  # get next chunk of board reports (waits)
+
+  def read(self, n =1):
+    try:
+      data = self.sock.recv(max(n, 4096))
+    except OSError:
+      data = b''
+    if not data:
+      self.gone()
+    return data
+
+
+  # send packets at normal priority for this client
+
+  def write(self, data):
+    self.send(self.prio, data)
+
+
+  # send packets ahead of everything else
+
+  def write_urgent(self, data):
+    self.send(URGENT, data)
+
+
+  # frame packets for broker (splitting very long batches)
+
+  def send(self, prio, data):
+    with self.lock:
+      try:
+        for i in range(0, len(data), 0xFFFF):
+          part = data[i:i + 0xFFFF]
+          self.sock.sendall(MSG.pack(prio, len(part)) + part)
+      except OSError:
+        self.gone()
+        raise
+
+
+  # complain once (unless closed on purpose) when broker disconnects
+
+  def gone(self):
+    if self.is_open:
+      self.is_open = False
+      print("\n\x1b[1;31m>>> Lost board broker, robot no longer controlled!\x1b[0m")
+      _thread.interrupt_main()
+    time.sleep(0.1)
+
+
+  def close(self):
+    self.is_open = False
+    self.sock.close()
+
+
+# get a normal Board which talks through broker instead of serial port
+
+def BoardClient(path =BROKER, prio =1):
+  return Board(port=SockPort(path, prio))
+
+
+# -------------------------------------------------------------------------
+
+# owns serial port to board and serves any number of local clients
+# client writes are sent highest priority first, then in arrival order
+# everything board sends is copied unchanged to all clients
+# socket is only usable by same user, clients too slow to keep up are cut
+
+class MpiBroker:
+
+  # initialize state
+  def __init__(self, path =BROKER, dev ="/dev/ttyAMA0"):
+    self.halt = Event()
+    self.path = path
+
+    # open serial port same way as Board
+    self.port = serial.Serial(None, 1000000, timeout=0.1)
+    self.port.rts = False
+    self.port.dtr = False
+    self.port.setPort(dev)
+    self.port.open()
+
+    # client connections and pending writes
+    self.lock = Lock()
+    self.clients = []
+    self.txq = PriorityQueue()
+    self.seq = 0
+
+    # statistics
+    self.msgs = {}
+    self.bytes_in = 0
+    self.bytes_out = 0
+    self.dropped = 0
+    self.lat_sum = 0.0
+    self.lat_max = 0.0
+
+
+  # accept clients until told to stop
+
+  def Run(self):
+    if os.path.exists(self.path):
+      os.remove(self.path)
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    mask = os.umask(0o177)             # never briefly open to others
+    srv.bind(self.path)
+    os.umask(mask)
+    os.chmod(self.path, 0o600)
+    srv.listen(8)
+    srv.settimeout(0.5)
+    Thread(target=self.reader, daemon=True).start()
+    Thread(target=self.writer, daemon=True).start()
+    print("Board broker on " + self.path)
+    while not self.halt.is_set():
+      try:
+        conn, _ = srv.accept()
+      except socket.timeout:
+        continue
+      conn.settimeout(0.05)            # slow clients get cut, not others
+      with self.lock:
+        self.clients.append(conn)
+      Thread(target=self.client, args=(conn,), daemon=True).start()
+    srv.close()
+    os.remove(self.path)
+    self.Report()
+
+
+  # request shutdown (e.g. from signal)
+
+  def Quit(self, *args):
+    self.halt.set()
+
+
+  # -----------------------------------------------------------------------
+
+  # queue up packets from one client until it disconnects
+
+  def client(self, conn):
+    buf = bytearray()
+    while not self.halt.is_set():
+      try:
+        data = conn.recv(4096)
+      except socket.timeout:
+        continue
+      except OSError:
+        break
+      if not data:
+        break
+      buf += data
+      while len(buf) >= MSG.size:
+        prio, n = MSG.unpack_from(buf)
+        if len(buf) < MSG.size + n:
+          break
+        pkt = bytes(buf[MSG.size:MSG.size + n])
+        del buf[:MSG.size + n]
+        with self.lock:
+          self.seq += 1
+          self.txq.put((-prio, self.seq, time.monotonic(), pkt))
+    with self.lock:
+      if conn in self.clients:
+        self.clients.remove(conn)
+    conn.close()
+
+
+  # send queued packets to board, highest priority first
+
+  def writer(self):
+    while not self.halt.is_set():
+      nprio, _, tq, pkt = self.txq.get()
+      self.port.write(pkt)
+      dt = time.monotonic() - tq
+      self.msgs[-nprio] = self.msgs.get(-nprio, 0) + 1
+      self.bytes_out += len(pkt)
+      self.lat_sum += dt
+      self.lat_max = max(self.lat_max, dt)
+
+
+  # copy everything board sends to all clients
+
+  def reader(self):
+    while not self.halt.is_set():
+      n = self.port.in_waiting
+      data = self.port.read(n if n > 0 else 1)
+      if not data:
+        continue
+      self.bytes_in += len(data)
+      with self.lock:
+        conns = list(self.clients)
+      for conn in conns:
+        try:
+          conn.sendall(data)
+        except socket.timeout:
+          self.dropped += 1
+          self.drop(conn)
+        except OSError:
+          self.drop(conn)
+
+
+  # disconnect client whose stream may now end with a partial frame
+  # its own thread then sees end of data and cleans up
+
+  def drop(self, conn):
+    with self.lock:
+      if conn not in self.clients:
+        return
+      self.clients.remove(conn)
+    try:
+      conn.shutdown(socket.SHUT_RDWR)
+    except OSError:
+      pass
+
+
+  # print traffic and added latency
+
+  def Report(self):
+    n = max(1, sum(self.msgs.values()))
+    print("Broker: %d bytes to board, %d bytes from board, %d slow clients dropped"
+          % (self.bytes_out, self.bytes_in, self.dropped))
+    print("  writes by priority %s, queued avg %4.2f max %4.2f ms"
+          % (dict(sorted(self.msgs.items())), 1000.0 * self.lat_sum / n, 1000.0 * self.lat_max))
+
+
+# =========================================================================
+
+# time n five servo readbacks (command out, reply back) through some Board
+# returns sorted round trip times (secs) of answered ones
+
+def round_trips(bd, n):
+  bd.enable_reception()
+  rt = []
+  for i in range(n):
+    t = time.monotonic()
+    got = bd.pwm_servo_read_positions((6, 5, 4, 3, 1))
+    if None not in got:
+      rt.append(time.monotonic() - t)
+    time.sleep(0.01)
+  bd.enable_reception(False)
+  rt.sort()
+  return rt
+
+
+# end to end latency added by broker using board emulator (mpi_emu.py)
+# compares servo readbacks direct on serial port versus through broker
+# added one way command delay is at most the added round trip
+
+def broker_bench(n =300):
+  from mpi_emu import BoardEmu         # here to avoid circular import
+  emu = BoardEmu(100.0)
+  emu.start()
+  bd = Board(emu.path)
+  direct = round_trips(bd, n)
+  bd.port.close()
+  path = "/tmp/mpi_bench.sock"
+  b = MpiBroker(path, emu.path)
+  Thread(target=b.Run, daemon=True).start()
+  time.sleep(0.5)
+  bd = BoardClient(path)
+  brokered = round_trips(bd, n)
+  bd.port.close()
+  b.Quit()
+  time.sleep(1.0)
+  emu.Done()
+  pct = lambda v, f: 1000.0 * v[min(len(v) - 1, int(f * len(v)))] if v else 0.0
+  print("Servo readback round trip (ms):   p50    p95    max  answered")
+  for name, v in (("direct", direct), ("broker", brokered)):
+    print("  %-8s                      %5.2f  %5.2f  %5.2f  %d of %d"
+          % (name, pct(v, 0.5), pct(v, 0.95), pct(v, 1.0), len(v), n))
+  print("Broker adds %4.2f ms (p50) %4.2f ms (p95) per round trip"
+        % (pct(brokered, 0.5) - pct(direct, 0.5), pct(brokered, 0.95) - pct(direct, 0.95)))
+
+
+# =========================================================================
+
+# run broker until killed: "python mpi_broker.py [device]"
+# or measure its added latency with emulator: "python mpi_broker.py bench"
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+    broker_bench()
+    sys.exit(0)
+  b = MpiBroker(dev=(sys.argv[1] if len(sys.argv) > 1 else "/dev/ttyAMA0"))
+  signal.signal(signal.SIGINT, b.Quit)
+  signal.signal(signal.SIGTERM, b.Quit)
+  b.Run()
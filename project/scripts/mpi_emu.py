@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# mpi_emu.py : pseudo-terminal stand-in for MasterPi expansion board
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import multiprocessing as mp, os, sys, pty, tty, time, struct, random, select
+
+from mpi_sim import SimBoard
+
+sys.path.append('/home/pi/Ganbei/Hiwonder')
+from Board_25 import Board
+from board_codec import PacketFunction, encode_packet, decode_frames
+
+
+# packet function numbers
+
+F_SYS   = int(PacketFunction.PACKET_FUNC_SYS)
+F_BUZZ  = int(PacketFunction.PACKET_FUNC_BUZZER)
+F_MOTOR = int(PacketFunction.PACKET_FUNC_MOTOR)
+F_PWM   = int(PacketFunction.PACKET_FUNC_PWM_SERVO)
+F_IMU   = int(PacketFunction.PACKET_FUNC_IMU)
+F_RGB   = int(PacketFunction.PACKET_FUNC_RGB)
+
+
+# -------------------------------------------------------------------------
+
+# pseudo-terminal stand-in for STM32 expansion board (own process)
+# speaks same 0xAA 0x55 func len data crc8 protocol as real board
+# servo and wheel physics come from SimBoard, IMU gyro follows rotation
+# IMU accel is in g and gyro in deg/sec (like Board.get_imu)
+# can corrupt checksums (crc) or drop single bytes (loss) at random
+
+class BoardEmu(mp.Process):
+
+  # initialize state (report rates in Hz, error rates as probabilities)
+  def __init__(self, imu_hz =100.0, sys_hz =1.0, crc =0.0, loss =0.0, mv =7800):
+    super(BoardEmu, self).__init__(daemon=True)
+    self.halt = mp.Event()
+    self.imu_hz = imu_hz
+    self.sys_hz = sys_hz
+    self.crc = crc
+    self.loss = loss
+    self.mv = mv
+
+    # board side keeps master end, Board opens path of slave end
+    self.master, self.slave = pty.openpty()
+    tty.setraw(self.slave)
+    self.path = os.ttyname(self.slave)
+
+
+  # -----------------------------------------------------------------------
+
+  # override Process.run() which is called by start()
+
+  def run(self):
+    self.bd = SimBoard(self.mv)
+    self.bd.enable_reception()
+    self.rx = {}
+    self.tx = {}
+    self.bad, self.lost = 0, 0
+    self.hd0 = self.bd.hd
+    buf = bytearray()
+    now = time.monotonic()
+    t_imu, t_sys = now, now
+    while not self.halt.is_set():
+      now = time.monotonic()
+      due = min(t_imu if self.imu_hz > 0 else now + 0.1, t_sys if self.sys_hz > 0 else now + 0.1)
+      ready, _, _ = select.select([self.master], [], [], max(0.0, min(due - now, 0.1)))
+      if ready:
+        try:
+          buf += os.read(self.master, 4096)
+        except OSError:
+          break                        # other end went away
+        del buf[:self.parse(buf)]
+      now = time.monotonic()
+      if self.imu_hz > 0 and now >= t_imu:
+        self.emit(F_IMU, self.imu())
+        t_imu = max(t_imu + 1.0 / self.imu_hz, now - 0.1)
+      if self.sys_hz > 0 and now >= t_sys:
+        self.emit(F_SYS, struct.pack('<BH', 0x04, self.bd.get_battery()))
+        t_sys = max(t_sys + 1.0 / self.sys_hz, now - 0.1)
+    self.Report()
+
+
+  # execute all complete command frames in buffer
+  # returns number of leading bytes consumed
+
+  def parse(self, buf):
+    frames, used = decode_frames(buf)
+    for func, data in frames:
+      self.rx[func] = self.rx.get(func, 0) + 1
+      self.command(func, data)
+    return used
+
+
+  # act on one command from host
+
+  def command(self, func, data):
+    if len(data) < 2:
+      return
+    sub = data[0]
+    if func == F_PWM:
+      if sub == 0x01:
+        dur, cnt = struct.unpack_from('<HB', data, 1)
+        pos = [struct.unpack_from('<BH', data, 4 + 3 * k) for k in range(cnt)]
+        self.bd.pwm_servo_set_position(0.001 * dur, pos)
+      elif sub == 0x05:
+        sid = data[1]
+        self.emit(F_PWM, struct.pack('<BBH', sid, 0x05, int(self.bd.Pulse(sid))))
+      elif sub == 0x09:
+        self.emit(F_PWM, struct.pack('<BBb', data[1], 0x09, 0))
+    elif func == F_MOTOR and sub == 0x05:
+      self.bd.set_motor_duty([(m + 1, d) for m, d in struct.iter_unpack('<Bf', data[2:2 + 5 * data[1]])])
+    elif func == F_RGB and sub == 0x01:
+      self.bd.set_rgb([(k + 1, r, g, b) for k, r, g, b in struct.iter_unpack('<BBBB', data[2:2 + 4 * data[1]])])
+    elif func == F_BUZZ and len(data) >= 8:
+      freq, on, off, rep = struct.unpack('<HHHH', data[:8])
+      self.bd.set_buzzer(freq, 0.001 * on, 0.001 * off, rep)
+
+
+  # IMU sample: level and still except for yaw rate from wheels
+
+  def imu(self):
+    self.bd.Wheels()
+    dt = 1.0 / self.imu_hz
+    gz = (self.bd.hd - self.hd0) / dt
+    self.hd0 = self.bd.hd
+    ns = random.gauss
+    return struct.pack('<6f', ns(0, 0.01), ns(0, 0.01), 1.0 + ns(0, 0.01),
+                       ns(0.3, 0.1), ns(-0.2, 0.1), gz + ns(0.5, 0.1))
+
+
+  # send one report frame possibly with injected errors
+
+  def emit(self, func, data):
+    pkt = bytearray(encode_packet(func, data))
+    if self.crc > 0 and random.random() < self.crc:
+      pkt[-1] ^= 0x5A
+      self.bad += 1
+    if self.loss > 0 and random.random() < self.loss:
+      del pkt[random.randrange(len(pkt))]
+      self.lost += 1
+    self.tx[func] = self.tx.get(func, 0) + 1
+    try:
+      os.write(self.master, pkt)
+    except OSError:
+      pass
+
+
+  # -----------------------------------------------------------------------
+
+  # stop emulator process
+
+  def Done(self):
+    self.halt.set()
+    self.join(2.0)
+    os.close(self.slave)
+    os.close(self.master)
+
+
+  # print frames seen and sent by function (runs in emulator process)
+
+  def Report(self):
+    name = lambda f: PacketFunction(f).name[12:].lower()
+    print("Emulator got %s" % ", ".join("%s %d" % (name(f), n) for f, n in sorted(self.rx.items())))
+    print("  sent %s (%d bad crc, %d short)"
+          % (", ".join("%s %d" % (name(f), n) for f, n in sorted(self.tx.items())), self.bad, self.lost))
+
+
+# =========================================================================
+
+# stress Board against emulator: "python mpi_emu.py [imu_hz] [secs] [crc] [loss]"
+# sends pose and wheel commands at 30 Hz while reading back servos
+
+def emu_bench(imu_hz, secs, crc, loss):
+  emu = BoardEmu(imu_hz, 1.0, crc, loss)
+  emu.start()
+  bd = Board(emu.path)
+  bd.enable_reception()
+  rt, miss = [], 0
+  cpu0, t0 = time.process_time(), time.monotonic()
+  k = 0
+  while time.monotonic() - t0 < secs:
+    k += 1
+    pw = 1500 + (k % 60) * 5
+    bd.tx_batch()
+    bd.pwm_servo_set_position(0.033, [[6, pw], [5, pw], [4, pw], [3, pw], [1, pw]])
+    bd.set_motor_duty([[1, -20], [2, 20], [3, -20], [4, 20]])
+    bd.tx_flush()
+    if k % 10 == 0:
+      t = time.monotonic()
+      got = bd.pwm_servo_read_positions((6, 5, 4, 3, 1))
+      rt.append(time.monotonic() - t)
+      miss += sum(1 for g in got if g is None)
+    bd.get_imu()
+    time.sleep(1.0 / 30.0)
+  cpu, dt = time.process_time() - cpu0, time.monotonic() - t0
+  bd.set_motor_duty([[1, 0], [2, 0], [3, 0], [4, 0]], True)
+  time.sleep(0.1)
+  st = bd.link_stats()
+  emu.Done()
+  rt.sort()
+  print("Host CPU %4.1f%% of one core over %3.1f secs (IMU at %d Hz)" % (100.0 * cpu / dt, dt, imu_hz))
+  print("  in %d frames (%4.1f/s), %d crc fails, %d resyncs, drops %s"
+        % (st['frames_in'], st['in_fps'], st['crc_fails'], st['resyncs'], st['drops'] or '-'))
+  print("  out %d frames in %d writes, queued latency avg %4.2f max %4.2f ms"
+        % (st['frames_out'], st['writes'], 1000.0 * st['lat_avg'], 1000.0 * st['lat_max']))
+  if rt:
+    print("  5 servo readback: median %4.2f max %4.2f ms, %d unanswered"
+          % (1000.0 * rt[len(rt) // 2], 1000.0 * rt[-1], miss))
+
+
+if __name__ == "__main__":
+  arg = lambda i, d: float(sys.argv[i]) if len(sys.argv) > i else d
+  emu_bench(arg(1, 100.0), arg(2, 10.0), arg(3, 0.0), arg(4, 0.0))
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# mpi_guard.py : proximity reflex that limits forward driving speed
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import numpy as np, time
+from math import radians, cos
+
+from threading import Thread, Event
+
+from mpi_hiwonder import MasterPi      # for testing
+from mpi_sonar import MpiSonar         # for testing
+
+
+# -------------------------------------------------------------------------
+
+# safety reflex running in its own thread independent of main loop
+# nearest obstacle is the closer of filtered sonar and TOF image center
+# TOF only counts when range sensor is looking roughly straight ahead
+# forward speed limit falls linearly from "slow" distance to zero at "stop"
+# limit is applied by MasterPi.Limit which also cuts current motion at once
+# if neither sensor has given a usable reading for a while speed is capped
+# latency is from sonar reading showing obstacle to reduced wheel command
+# TOF frames carry no capture time so their interventions are only counted
+
+class MpiGuard(Thread):
+
+  # initialize state (robot, sonar sampler, optional CamWatch and MpiArm)
+  def __init__(self, mpi, sonar, watch =None, arm =None, hz =50.0, stop =6.0, slow =15.0):
+    super(MpiGuard, self).__init__(daemon=True)
+    self.halt = Event()
+    self.bot = mpi
+    self.sonar = sonar
+    self.watch = watch
+    self.arm = arm
+
+    # reflex timing and thresholds (inches)
+    self.wait = 1.0 / hz
+    self.stop = stop
+    self.slow = slow
+    self.vmax = 12.0                   # fastest possible forward ips
+    self.vblind = 3.0                  # forward ips cap when sensors fail
+    self.grace = 10                    # checks without data before cap
+
+    # TOF image usage
+    self.aim  = 25.0                   # max pan or tilt to count (degs)
+    self.npel = 20                     # pixels needed closer than result
+    self.stale = 0.3                   # ignore frames older than this (secs)
+    self.rseq = 0
+    self.tnear = None
+    self.tt = 0.0
+
+    # current state
+    self.near = None
+    self.src = '-'
+    self.active = False
+
+    # statistics
+    self.n = 0
+    self.blind = 0
+    self.dark = 0                      # consecutive checks without data
+    self.outages = 0
+    self.gap = 0.0
+    self.stops = 0
+    self.tof_stops = 0
+    self.lat = []
+    self.held = 0.0
+    self.t0 = 0.0
+
+
+  # -----------------------------------------------------------------------
+
+  # override Thread.run() which is called by start()
+
+  def run(self):
+    self.t0 = time.monotonic()
+    last = self.t0
+    due = self.t0
+    while not self.halt.is_set():
+      now = time.monotonic()
+      self.n += 1
+      self.gap = max(self.gap, now - last)
+      if self.active:
+        self.held += now - last
+      last = now
+      self.check(now)
+      due = max(due + self.wait, time.monotonic())
+      self.halt.wait(due - time.monotonic())
+    self.bot.Limit(None)
+
+
+  # find nearest obstacle then apply (or remove) speed limit
+
+  def check(self, now):
+    near, src, ts = None, '-', 0.0
+    if self.sonar is not None:
+      d, t, ok = self.sonar.Range()
+      if ok:
+        near, src, ts = d, 'sonar', t
+    d, t = self.tof_near(now)
+    if d is not None and (near is None or d < near):
+      near, src, ts = d, 'tof', t
+    self.near, self.src = near, src
+
+    # slow down approaching obstacle and stop if too close
+    lim = None
+    if near is not None and near < self.slow:
+      lim = self.vmax * max(0.0, near - self.stop) / (self.slow - self.stop)
+
+    # fail safe: creep if no sensor has reported for too long
+    if near is None:
+      self.blind += 1
+      self.dark += 1
+      if self.dark == self.grace:
+        self.outages += 1
+        print("\n\x1b[1;33m>>> Safety: no proximity data, capping speed\x1b[0m")
+      if self.dark >= self.grace:
+        lim = self.vblind
+    else:
+      self.dark = 0
+    cut = self.bot.Limit(lim)
+
+    # note when reflex first has to intervene for an obstacle
+    if cut and not self.active and near is not None:
+      self.stops += 1
+      act = "stop" if lim <= 0.0 else "slow"
+      if src == 'sonar':
+        dt = time.monotonic() - ts
+        self.lat.append(dt)
+        print("\n\x1b[1;33m>>> Safety %s: sonar obstacle at %3.1f\" (%3.0f ms)\x1b[0m"
+              % (act, near, 1000.0 * dt))
+      else:
+        self.tof_stops += 1
+        print("\n\x1b[1;33m>>> Safety %s: tof obstacle at %3.1f\"\x1b[0m" % (act, near))
+    self.active = cut
+
+
+  # nearest return (in) in center of newest TOF image and when it was seen
+  # returns None if no recent frame or sensor not pointing forward
+  # Note: time is when guard first saw frame, not when it was captured
+
+  def tof_near(self, now):
+    if self.watch is None:
+      return None, 0.0
+    buf, self.rseq = self.watch.Depth(self.rseq)
+    if buf is not None:
+      p, t = 0.0, 0.0
+      if self.arm is not None:
+        p, t, _ = self.arm.View()
+      self.tnear = None
+      if abs(p) <= self.aim and abs(t) <= self.aim:
+        img = self.watch.tof.fmt_pels(buf, 1, 16)[30:70, 30:70].ravel()
+        v = img[(img > 0) & (img < 0xFFFF)]
+        if len(v) >= self.npel:
+          mm = 0.25 * np.partition(v, self.npel - 1)[self.npel - 1]
+          self.tnear = cos(radians(t)) * mm / 25.4
+      self.tt = now
+    if self.tnear is None or (now - self.tt) > self.stale:
+      return None, 0.0
+    return self.tnear, self.tt
+
+
+  # -----------------------------------------------------------------------
+
+  # begin checking (call once sensors are running)
+
+  def Watch(self):
+    self.start()
+
+
+  # nearest obstacle (in, None if unknown) and which sensor saw it
+
+  def Nearest(self):
+    return self.near, self.src
+
+
+  # signal thread to cleanly terminate then wait for it
+
+  def Done(self):
+    self.halt.set()
+    if self.is_alive():
+      Thread.join(self, None)
+
+
+  # print reflex rate and intervention latencies
+
+  def Report(self):
+    if self.n <= 0:
+      return
+    dt = max(1e-6, time.monotonic() - self.t0)
+    print("Guard: %d checks at %3.1f Hz (max gap %3.1f ms), limiting %3.1f secs"
+          % (self.n, self.n / dt, 1000.0 * self.gap, self.held))
+    print("  %d checks without data, %d sensor outages (capped at %3.1f ips)"
+          % (self.blind, self.outages, self.vblind))
+    if self.stops > 0:
+      print("  %d interventions (%d by TOF, latency unknown)" % (self.stops, self.tof_stops))
+    if self.lat:
+      print("  sonar latency avg %3.1f max %3.1f ms"
+            % (1000.0 * sum(self.lat) / len(self.lat), 1000.0 * max(self.lat)))
+
+
+# =========================================================================
+
+# simple test drives slowly forward until something is in the way
+
+if __name__ == "__main__":
+  bot = MasterPi()
+  sonar = MpiSonar(bot)
+  guard = MpiGuard(bot, sonar)
+  guard.Watch()
+  bot.Mecanum(8, 0, 0)
+  for i in range(50):
+    time.sleep(0.1)
+    near, src = guard.Nearest()
+    print("nearest %s (%s)" % ("%4.1f\"" % near if near is not None else "--", src))
+  bot.Freeze()
+  guard.Done()
+  sonar.Done()
+  guard.Report()
@@ -25,12 +25,14 @@
 # 
 # =========================================================================
 
-import os, time, socket, yaml, sys
+import os, time, socket, yaml, sys, struct
 from math import radians, cos, sin
+from threading import Lock
 
 sys.path.append('/home/pi/Ganbei/Hiwonder')
 from Board_25 import Board
 from Sonar_2x import Sonar   
+from mpi_broker import BROKER, BoardClient
 
 
 # helper function for playing standard sounds
@@ -59,6 +61,68 @@ def LowBatt(load=1):
     return v
 
 
+# -------------------------------------------------------------------------
+
+# remembers last value sent to each output device to suppress repeats
+# identical commands still go out every "refresh" seconds as a keep-alive
+# tallies packets and bytes actually sent versus saved for each device
+
+class SendCache:
+
+  # initialize state (keep-alive interval in seconds)
+  def __init__(self, refresh =0.5):
+    self.refresh = refresh
+    self.last = {}                     # device -> (value, time sent)
+    self.tally = {}                    # device -> [sent, saved, bytes, saved bytes]
+
+
+  # decide whether value for device differs from last or is getting stale
+  # returns True if command should actually be transmitted
+  # Note: caller should Forget(dev) if the send later fails
+
+  def Need(self, dev, val, nbytes):
+    now = time.monotonic()
+    t = self.tally.get(dev)
+    if t is None:
+      t = [0, 0, 0, 0]
+      self.tally[dev] = t
+    prev = self.last.get(dev)
+    if prev is not None and prev[0] == val and (now - prev[1]) < self.refresh:
+      t[1] += 1
+      t[3] += nbytes
+      return False
+    self.last[dev] = (val, now)
+    t[0] += 1
+    t[2] += nbytes
+    return True
+
+
+  # record value for device as sent by some other route (e.g. Freeze)
+
+  def Sent(self, dev, val):
+    self.last[dev] = (val, time.monotonic())
+
+
+  # force next command to some device (or all) to be transmitted
+
+  def Forget(self, dev =None):
+    if dev is None:
+      self.last.clear()
+    else:
+      self.last.pop(dev, None)
+
+
+  # print packets and bytes sent versus saved for each device
+
+  def Report(self):
+    if not self.tally:
+      return
+    print("Output packets (sent / saved, bytes sent / saved):")
+    for dev, t in self.tally.items():
+      pct = 100.0 * t[1] / max(1, t[0] + t[1])
+      print("  %-8s %7d / %7d  %8d / %8d  (%2.0f%% saved)" % (dev, t[0], t[1], t[2], t[3], pct))
+
+
 # -------------------------------------------------------------------------
 
 
@@ -68,49 +132,63 @@ def LowBatt(load=1):
 class MasterPi:
 
   # initialize components and state
-  def __init__(self, grab=1):
+  # dev can name some other port (e.g. pty of board emulator in mpi_emu)
+  def __init__(self, grab=1, dev="/dev/ttyAMA0"):
 
-    # disconnect battery monitoring service to free up serial port
-    if grab > 0:
-      os.system("sudo pkill -f mpi_battery.py")
-    if os.system("lsof /dev/ttyAMA0 > /dev/null") == 0:
-      raise ValueError("Serial port /dev/ttyAMA0 blocked!")
+    # share board through broker if running (see mpi_broker.py)
+    self.bd = None
+    self.shared = False
+    if dev == "/dev/ttyAMA0" and os.path.exists(BROKER):
+      try:
+        self.bd = BoardClient(BROKER)
+        self.shared = True
+      except OSError:
+        self.bd = None                 # stale socket
+
+    # otherwise disconnect battery monitoring service to free up serial port
+    if self.bd is None:
+      if grab > 0 and dev == "/dev/ttyAMA0":
+        os.system("sudo pkill -f mpi_battery.py")
+      if os.system("lsof " + dev + " > /dev/null") == 0:
+        raise ValueError("Serial port " + dev + " blocked!")
+      self.bd = Board(dev)
 
     # set up to read voltage and make sure wheels are stopped
-    self.bd = Board()
+    # Note: if shared then another program may be driving so leave all alone
+    self.out = SendCache()
+    self.guard_init()
+    self.bd.tx_lost = self.tx_lost
     self.bd.enable_reception()
-    self.Freeze()     
+    if not self.shared:
+      self.Freeze()     
 
     # connect independent sonar sensor                
     self.sn = Sonar()
-    self.sn.setRGBMode(0)
+    if not self.shared:
+      self.sn.setRGBMode(0)
 
     # initialize state
     self.boff, self.soff, self.eoff, self.woff, self.goff = 0, 0, 0, 0, 0
     self.bsc, self.ssc, self.esc, self.wsc, self.gsc = 11.5, 11.5, 11.5, 11.5, 13.1 
  
-    # all LEDs off at beginning
-    self.Body(0)
-    self.Eyes(0) 
+    # all LEDs off at beginning (unless some other program owns them)
+    if not self.shared:
+      self.Body(0)
+      self.Eyes(0) 
 
 
   # --------------------------- CALIBRATION -------------------------------
 
   # set native Hiwonder mechanism to no pulse width offet for all servos
   # only has to be called once ever (persists across power cycling)
-  # will auto-retry a few times if command not initially accepted
+  # serial writer will auto-retry a few times if command not accepted
  
   def ZeroDevs(self):
-    for i in range(10):
-      try:
-        self.bd.pwm_servo_set_offset(1, 0)
-        self.bd.pwm_servo_set_offset(3, 0)
-        self.bd.pwm_servo_set_offset(4, 0)
-        self.bd.pwm_servo_set_offset(5, 0)
-        self.bd.pwm_servo_set_offset(6, 0)
-        break
-      except:
-        time.sleep(0.01)         
+    self.bd.pwm_servo_set_offset(1, 0)
+    self.bd.pwm_servo_set_offset(3, 0)
+    self.bd.pwm_servo_set_offset(4, 0)
+    self.bd.pwm_servo_set_offset(5, 0)
+    self.bd.pwm_servo_set_offset(6, 0)
 
 
   # load linear calibration data for servos (must call before other fcns)
@@ -202,11 +280,64 @@ class MasterPi:
   # ----------------------------- SENSORS ---------------------------------
 
   # returns range (in) determined by front facing sonar
+  # Note: waits for I2C transaction, MpiSonar gives filtered value instantly
 
   def Prox(self):
     return self.sn.getDistance() / 25.4  
 
 
+  # read back actual joint angles (deg) in Pose order with one round trip
+  # b = base, s = shoulder, e = elbow, w = wrist, g = gripper
+  # returns None if some servo did not answer in time
+
+  def Angles(self):
+    pws = self.bd.pwm_servo_read_positions((6, 5, 4, 3, 1))
+    ang = []
+    for jt, pw in zip((6, 5, 4, 3, 1), pws):
+      if pw is None:
+        return None
+      off, sc = self.GetCal(jt)
+      ang.append((pw - 1500 - off) / sc)
+    return tuple(ang)
+
+
+  # serial link counters plus sonar I2C counters (dict)
+
+  def LinkStats(self):
+    st = self.bd.link_stats()
+    st['i2c'] = self.sn.i2c_stats()
+    return st
+
+
+  # print serial link health and throughput
+
+  def LinkReport(self):
+    st = self.LinkStats()
+    print("Serial link over %3.1f secs:" % st['secs'])
+    print("  in  %7d bytes (%5.0f/s) %6d frames (%4.1f/s)  crc fails %d, resyncs %d (%d bytes)"
+          % (st['bytes_in'], st['in_bps'], st['frames_in'], st['in_fps'],
+             st['crc_fails'], st['resyncs'], st['junk']))
+    print("  out %7d bytes (%5.0f/s) %6d frames (%4.1f/s)  in %d writes, %d superseded"
+          % (st['bytes_out'], st['out_bps'], st['frames_out'], st['out_fps'],
+             st['writes'], st['superseded']))
+    print("  latency queued avg %4.2f max %4.2f ms, write avg %4.2f max %4.2f ms"
+          % (1000.0 * st['lat_avg'], 1000.0 * st['lat_max'], 1000.0 * st['write_avg'], 1000.0 * st['write_max']))
+    print("  errors rx %d tx %d, drops %s, retries %s, lost %s"
+          % (st['rx_errors'], st['tx_errors'], st['drops'] or '-', st['retries'] or '-', st['lost'] or '-'))
+    i2c = st['i2c']
+    print("Sonar I2C: %s, %d unchanged colors skipped, %d errors"
+          % (", ".join("%s %d avg %4.2f max %4.2f ms" % (op, v['calls'], 1000.0 * v['avg'], 1000.0 * v['max'])
+                       for op, v in sorted(i2c['ops'].items())) or "idle", i2c['skipped'], i2c['errors']))
+
+
+  # have fn(ax, ay, az, gx, gy, gz, t) called on every IMU report
+  # accel is in g, gyro in dps, t is monotonic arrival time
+  # Note: runs in serial receive thread so fn should be quick
+
+  def OnImu(self, fn):
+    self.bd.subscribe('imu', lambda data, t, seq: fn(*struct.unpack('<6f', data), t))
+
+
   # returns current battery voltage
 
   def Voltage(self):
@@ -219,6 +350,13 @@ class MasterPi:
     return 0.001 * mv
 
 
+  # have fn(volts) called whenever board reports its battery voltage
+  # Note: runs in serial receive thread so fn should be quick
+
+  def OnVoltage(self, fn):
+    self.bd.subscribe('battery', lambda data, t, seq: fn(0.001 * struct.unpack('<H', data[1:3])[0]))
+
+
 # ---------------------------- ACTUATORS --------------------------------
 
   # activate or silence onboard buzzer
@@ -233,6 +371,8 @@ class MasterPi:
   # sets both backboard LEDs to some 0xRRGGBB value
 
   def Body(self, col):
+    if not self.out.Need('body', col, 15):
+      return
     r =  (col >> 16)         >> 1
     g = ((col >>  8) & 0xFF) >> 1
     b =  (col        & 0xFF) >> 1
@@ -242,30 +382,48 @@ class MasterPi:
   # sets both sonar LEDs to some 0xRRGGBB value
 
   def Eyes(self, col):
+    if not self.out.Need('eyes', col, 7):        # one 6 register I2C block write
+      return
+    errs = self.sn.errors
+    if self.sn.RGBMode != 0:
+      self.sn.setRGBMode(0)            # stop any hardware breathing
     r = col >> 16;
     g = (col >> 8) & 0xFF
     b = col & 0xFF
     self.sn.setPixelColor(0, (r, g, b))
     self.sn.setPixelColor(1, (r, g, b))  
     self.sn.show()           
+    if self.sn.errors != errs:
+      self.out.Forget('eyes')          # driver only prints failures
+
+
+  # have sonar LEDs breathe up to some 0xRRGGBB value on their own
+  # period is in seconds, stays in effect until next Eyes command
+
+  def EyesBreath(self, col, period):
+    if not self.out.Need('eyes', (col, period), 21):   # cycles, mode, colors
+      return
+    r = col >> 16;
+    g = (col >> 8) & 0xFF
+    b = col & 0xFF
+    errs = self.sn.errors
+    self.sn.setBreathing((r, g, b), int(1000.0 * period))
+    if self.sn.errors != errs:
+      self.out.Forget('eyes')
 
 
   # set an individual servo command (usec) and transition time (sec)
   # jt: 1 = gripper, 3 = wrist, 4 = elbow, 5 = shoulder, 6 = base
-  # will auto-retry a few times if command not initially accepted
+  # serial writer will auto-retry a few times if command not accepted
 
   def Servo(self, id, wid, ramp):
-    for i in range(10):
-      try:
-        self.bd.pwm_servo_set_position(ramp, [[id, int(wid)]])
-        break
-      except:
-        time.sleep(0.01)
+    self.out.Forget('pose')
+    self.bd.pwm_servo_set_position(ramp, [[id, int(wid)]])
 
 
   # set an individual servo angle (deg) and transition time (sec)
   # jt: 1 = gripper, 3 = wrist, 4 = elbow, 5 = shoulder, 6 = base
-  # will auto-retry a few times if command not initially accepted
+  # serial writer will auto-retry a few times if command not accepted
 
   def Joint(self, jt, ang, ramp):
     off, sc = self.GetCal(jt)
@@ -281,26 +439,90 @@ class MasterPi:
     ew = 1500 + int(self.esc * e + 0.5) + self.eoff
     ww = 1500 + int(self.wsc * w + 0.5) + self.woff
     gw = 1500 + int(self.gsc * g + 0.5) + self.goff
+    if not self.out.Need('pose', (bw, sw, ew, ww, gw, int(ramp * 1000)), 24):
+      return
     self.bd.pwm_servo_set_position(ramp, [[6, bw], [5, sw], [4, ew], [3, ww], [1, gw]])
 
 
-  # stop all wheels immediately
-  # will auto-retry a few times if command not initially accepted
+  # stop all wheels immediately (never suppressed)
+  # serial writer will auto-retry a few times if command not accepted
 
   def Freeze(self):
-    for i in range(10):
-      try:
-        self.bd.set_motor_duty([[1, 0], [2, 0], [3, 0], [4, 0]])
-        break
-      except:
-        time.sleep(0.01)
+    with self.mlock:                   # not while Limit is re-sending
+      self.bd.set_motor_duty([[1, 0], [2, 0], [3, 0], [4, 0]], True)
+      self.out.Sent('wheels', (0, 0, 0, 0))
+      self.mec = (0, 0, 0)             # nothing for Limit to resume
+
+
+  # serial writer gave up on some keyed packet (called from its thread)
+  # next command for that device then goes out even if unchanged
+
+  def tx_lost(self, key):
+    self.out.Forget({'duty': 'wheels', 'rgb': 'body', 'pose': 'pose'}.get(key, key))
+
+
+  # collect commands from one control cycle into a single serial write
+  # Freeze and servo reads are never held back
+
+  def Hold(self):
+    self.bd.tx_batch()
+
+
+  # send everything collected since Hold
+
+  def Release(self):
+    self.bd.tx_flush()
 
 
   # sets wheel commands based on move speed, driving angle, and turn speed
   # mv is ips (12 max), skew is ccw degs from forward, rot is ccw dps (120 max) 
-  # returns factor by which speeds were slowed down due to saturation, 0 if problem
+  # forward part of motion is reduced if over any safety Limit
+  # returns factor by which speeds were slowed down due to saturation
 
   def Mecanum(self, mv, skew, rot):
+    with self.mlock:
+      self.mec = (mv, skew, rot)
+      cut = self.clamp(mv, skew)
+      self.cut = (cut != mv)
+      return self.wheels(cut, skew, rot)
+
+
+  # set forward speed limit (ips, None = unlimited) from some safety layer
+  # immediately re-sends current motion if it is now over (or back under) limit
+  # can be called from any thread, returns True if motion is being reduced
+
+  def Limit(self, fwd):
+    with self.mlock:
+      self.fwd_max = fwd
+      mv, skew, rot = self.mec
+      cut = self.clamp(mv, skew)
+      if cut != mv or self.cut:
+        self.wheels(cut, skew, rot)
+      self.cut = (cut != mv)
+      return self.cut
+
+
+  # set up state for speed limiting (before first Freeze)
+
+  def guard_init(self):
+    self.mlock = Lock()
+    self.mec = (0, 0, 0)               # last requested motion
+    self.fwd_max = None
+    self.cut = False
+
+
+  # scale down whole motion so forward component is within limit
+
+  def clamp(self, mv, skew):
+    fwd = mv * cos(radians(skew))
+    if self.fwd_max is None or fwd <= self.fwd_max:
+      return mv
+    return mv * max(0.0, self.fwd_max) / fwd
+
+
+  # convert motion to individual wheel duty cycles and send
+
+  def wheels(self, mv, skew, rot):
 
     # convert to correct units (empirical calibration)
     veer = radians(skew + 90)
@@ -331,12 +553,11 @@ class MasterPi:
       v3 = int(rein * v3)
       v4 = int(rein * v4)
 
-    # set motor duty cycles 
-    try:
-      self.bd.set_motor_duty([[1, -v1], [2, v2], [3, -v3], [4, v4]])
+    # set motor duty cycles (unless same as last time)
+    if not self.out.Need('wheels', (v1, v2, v3, v4), 27):
       return rein
-    except:
-      return 0
+    self.bd.set_motor_duty([[1, -v1], [2, v2], [3, -v3], [4, v4]])
+    return rein
 
 
 # =========================================================================
@@ -379,7 +600,8 @@ if __name__ == "__main__":
   bot.Freeze()
   """
 
-  # report battery level
+  # report battery level and traffic saved
+  bot.out.Report()
   bot.Eyes(0)
   bot.Body(0)
   print("Battery = %4.2fv" % (bot.Voltage()))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# mpi_imu.py : vehicle attitude from MasterPi expansion board IMU
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import numpy as np, time
+from math import atan2, degrees, sqrt
+
+from threading import Lock
+
+from mpi_hiwonder import MasterPi      # for testing
+
+
+# -------------------------------------------------------------------------
+
+# vehicle attitude from expansion board IMU (accel in g, gyro in dps)
+# every report is handled as it arrives (in serial receive thread)
+# gyro bias is learned whenever the robot is sitting still
+# tilt and roll blend gyro rates with gravity direction (complementary)
+# heading is integrated yaw rate only (no magnetometer)
+# axes: x forward, y left, z up so heading is CCW, tilt is nose down,
+#       and roll is left side up
+
+class MpiImu:
+
+  # initialize state (takes robot interface object as argument)
+  def __init__(self, mpi, size =1024, tau =0.5):
+    self.lock = Lock()
+
+    # raw history: time, ax, ay, az, gx, gy, gz
+    self.ring = np.zeros((size, 7))
+    self.n = 0
+
+    # gyro bias estimation (needs "calib" still samples to start)
+    self.bx, self.by, self.bz = 0.0, 0.0, 0.0
+    self.calib = 100
+    self.still = 0
+    self.bf = 0.01                     # bias update rate when still
+
+    # filtered attitude (degs) and time of newest sample
+    self.tau = tau                     # trust accel over this time (secs)
+    self.hd   = 0.0
+    self.tilt = 0.0
+    self.roll = 0.0
+    self.t0 = 0.0
+    self.t  = 0.0
+
+    # start receiving reports
+    mpi.OnImu(self.sample)
+
+
+  # -----------------------------------------------------------------------
+
+  # handle one IMU report (called from serial receive thread)
+
+  def sample(self, ax, ay, az, gx, gy, gz, t):
+    with self.lock:
+      self.ring[self.n % len(self.ring)] = (t, ax, ay, az, gx, gy, gz)
+      self.n += 1
+      dt = 0.0 if self.t <= 0.0 else min(max(0.0, t - self.t), 0.1)
+      if self.t0 <= 0.0:
+        self.t0 = t
+      self.t = t
+
+      # learn gyro offsets when not moving (gravity only, small rates)
+      a = sqrt(ax * ax + ay * ay + az * az)
+      if abs(a - 1.0) < 0.05 and max(abs(gx - self.bx), abs(gy - self.by), abs(gz - self.bz)) < 3.0:
+        self.still += 1
+        f = 1.0 / self.still if self.still <= self.calib else self.bf
+        self.bx += f * (gx - self.bx)
+        self.by += f * (gy - self.by)
+        self.bz += f * (gz - self.bz)
+      elif self.still < self.calib:
+        self.still = 0                 # restart initial average
+      if self.still < self.calib:
+        return
+
+      # integrate corrected rates then pull toward gravity direction
+      k = self.tau / (self.tau + dt) if dt > 0.0 else 1.0
+      self.hd += (gz - self.bz) * dt
+      self.tilt = k * (self.tilt + (gy - self.by) * dt) + (1.0 - k) * degrees(atan2(-ax, az))
+      self.roll = k * (self.roll + (gx - self.bx) * dt) + (1.0 - k) * degrees(atan2(ay, az))
+
+
+  # whether bias has been learned and reports are still arriving
+
+  def Ready(self, stale =0.5):
+    return self.still >= self.calib and (time.monotonic() - self.t) < stale
+
+
+  # report CCW heading, tilt, and roll (degs) with time of newest sample
+  # heading starts at zero and is not wrapped
+
+  def Attitude(self):
+    with self.lock:
+      return self.hd, self.tilt, self.roll, self.t
+
+
+  # get copy of the last n raw samples (oldest first)
+
+  def Recent(self, n):
+    with self.lock:
+      n = min(n, self.n, len(self.ring))
+      idx = np.arange(self.n - n, self.n) % len(self.ring)
+      return self.ring[idx].copy()
+
+
+  # print sample rate and learned gyro bias
+
+  def Report(self):
+    if self.n <= 1:
+      print("IMU: no reports")
+      return
+    hz = (self.n - 1) / max(1e-6, self.t - self.t0)
+    print("IMU: %d samples at %3.0f Hz, gyro bias (%4.2f %4.2f %4.2f) dps, heading %3.1f"
+          % (self.n, hz, self.bx, self.by, self.bz, self.hd))
+
+
+# =========================================================================
+
+# simple test prints attitude for 10 seconds
+
+if __name__ == "__main__":
+  bot = MasterPi()
+  imu = MpiImu(bot)
+  for i in range(20):
+    time.sleep(0.5)
+    h, tilt, roll, t = imu.Attitude()
+    print("%s heading %5.1f, tilt %4.1f, roll %4.1f" % ("ok" if imu.Ready() else "--", h, tilt, roll))
+  imu.Report()
@@ -32,6 +32,98 @@ from threading import Thread, Event, Lock
 from mpi_hiwonder import MasterPi, PlaySFX, LowBatt        
 
 
+# -------------------------------------------------------------------------
+
+# precomputed LED frames for breathing plus fixed color override layers
+# gamma LUT and whole breathing cycle for each color are built only once
+# brightness is quantized so most ticks repeat the previous frame exactly
+# layers from highest to lowest priority: talk, flash, listen, then
+# breathing in low battery color (if low) or else mood color
+
+class LedAnim:
+
+  # override layers (pre-corrected 0xRRGGBB colors) in priority order
+  layers = ('talk', 'flash', 'listen')
+
+  # initialize state (ticks per half cycle, brightness range, exponent)
+  def __init__(self, half, lo, hi, levels =8, e =1.65):
+    self.half = half
+
+    # approximate gamma correction acts to squash low values (128 -> 82)
+    self.lut = [max(0, min(int(255.0 * pow(i / 255.0, e) + 0.5), 255)) for i in range(256)]
+
+    # brightness at each tick: full at 0, darkest at half, in coarse steps
+    self.wave = []
+    for cnt in range(2 * half):
+      q = round(levels * abs(half - cnt) / half) / levels
+      self.wave.append(q * (hi - lo) + lo)
+    self.frames = {}                   # breathing color -> list of RGB
+
+    # override layers and breathing colors (fractions of full intensity)
+    self.over = {}
+    self.mood = (1.0, 0.5, 0.0)        # orange
+    self.batt = (1.0, 0.0, 0.0)        # red
+    self.low = False
+    self.cur = self.mood
+    self.pend = None
+
+
+  # get full breathing cycle for some color (built on first use)
+
+  def cycle(self, rgb):
+    f = self.frames.get(rgb)
+    if f is None:
+      lut = self.lut
+      rf, gf, bf = rgb
+      f = [(lut[int(255.0 * v * rf + 0.5)] << 16) | (lut[int(255.0 * v * gf + 0.5)] << 8)
+           | lut[int(255.0 * v * bf + 0.5)] for v in self.wave]
+      self.frames[rgb] = f
+    return f
+
+
+  # set or clear (col < 0) some override layer
+
+  def Set(self, layer, col):
+    if col < 0:
+      self.over.pop(layer, None)
+    else:
+      self.over[layer] = col
+
+
+  # whether some override layer currently hides breathing
+
+  def Forced(self):
+    return len(self.over) > 0
+
+
+  # change mood breathing color (takes effect at darkest point)
+
+  def Breath(self, rgb):
+    self.mood = rgb
+    self.pend = self.batt if self.low else rgb
+
+
+  # switch breathing to or from low battery warning color
+
+  def Low(self, low):
+    if low != self.low:
+      self.low = low
+      self.pend = self.batt if low else self.mood
+
+
+  # LED color for given tick of breathing cycle
+
+  def Frame(self, cnt):
+    if self.pend is not None and (cnt == self.half or self.over):
+      self.cur = self.pend
+      self.pend = None
+    for layer in self.layers:
+      col = self.over.get(layer)
+      if col is not None:
+        return col
+    return self.cycle(self.cur)[cnt]
+
+
 # -------------------------------------------------------------------------
 
 # interface to MasterPi robot miscellaneous components
@@ -40,11 +132,13 @@ from mpi_hiwonder import MasterPi, PlaySFX, LowBatt
 class MpiShell(Thread):
 
   # initialize state (takes robot interface object as argument)
-  def __init__(self, mpi):
+  # hw > 0 lets sonar firmware do eye breathing (host only writes changes)
+  def __init__(self, mpi, hw =0):
     super(MpiShell, self).__init__()
     self.halt = Event()
     self.lock = Lock()
     self.bot = mpi           # for voltage
+    self.hw = hw
 
     # respiration and cycle rates
     self.bpm = 16.0
@@ -54,24 +148,22 @@ class MpiShell(Thread):
     self.wait = 1.0 / self.hz
     self.half = int(30.0 * self.hz / self.bpm + 0.5)
     self.full = 2 * self.half
-    self.step = 1.0 / self.half
 
-    # brightness variation
+    # brightness variation and precomputed frames
     self.mth1 = 0.5
     self.mth0 = 0.0
+    self.anim = LedAnim(self.half, self.mth0, self.mth1)
 
-    # breathing color (orange)
-    self.rmth = 1.0
-    self.gmth = 0.5
-    self.bmth = 0.0
-    self.pend = -1           # no change queued
-
-    # initial breathing state 
+    # breathing phase and last colors actually sent
     self.cnt = 0
-    self.brite = 1.0
-    self.force = -1
-
-    # battery monitoring
+    self.col = -1
+    self.eye = -1
+    self.ticks = 0
+    self.sent = 0
+    self.esent = 0
+
+    # battery monitoring (samples pushed by board)
+    self.vnew = 0.0
     self.vest = 0.0
     self.vchk = 60
     self.vhys = 0
@@ -79,6 +171,7 @@ class MpiShell(Thread):
 
     # set beeping threshold
     self.v10 = LowBatt()
+    self.bot.OnVoltage(self.vsample)
 
     # start background thread
     self.start()
@@ -97,51 +190,43 @@ class MpiShell(Thread):
     self.Talk(0)
 
 
-  # vary "brite" from 0 to 1 linearly
+  # advance breathing phase (held at darkest while overridden)
 
   def ramp(self):
-    inc = -self.step if self.cnt < self.half else self.step
-    self.brite += inc
-    self.brite = max(0.0, min(self.brite, 1.0))
     self.cnt += 1
     if self.cnt >= self.full:
       self.cnt = 0
-      self.brite = 1.0
 
 
   # change intensity of LEDs 
-  # switch color at darkest part of cycle
 
   def lights(self):
     with self.lock:
-      if self.pend > 0:
-        if self.cnt == self.half or self.force >= 0:
-          self.rmth = self.rmth2
-          self.gmth = self.gmth2
-          self.bmth = self.bmth2
-          self.pend = 0
-      if self.force >= 0:              # talk or flash ongoing
-        self.cnt = self.half
-        self.brite = 0.0
-        return
-    v = self.brite * (self.mth1 - self.mth0) + self.mth0
-    col = self.gamma(v * self.rmth, v * self.gmth, v * self.bmth)
-    self.bot.Eyes(col)
-    self.bot.Body(col)
-
-
-  # get an R:G:B color value with approximate gamma correction
-  # acts to squash low values (e.g. rf 0.50 -> red 81 not 128)
-
-  def gamma(self, rf, gf, bf):
-    e = 1.65
-    red = int(255.0 * pow(rf, e) + 0.5)
-    red = max(0, min(red, 255))
-    grn = int(255.0 * pow(gf, e) + 0.5)
-    grn = max(0, min(grn, 255))
-    blu = int(255.0 * pow(bf, e) + 0.5)
-    blu = max(0, min(blu, 255))
-    return (red << 16) | (grn << 8) | blu
+      if self.anim.Forced():
+        self.cnt = self.half           # resume breathing from dark
+      self.ticks += 1
+      self.emit()
+
+
+  # send current frame to LEDs only if different from last one
+  # in hardware mode eyes are just told breathing color and period
+  # Note: caller must hold lock
+
+  def emit(self):
+    col = self.anim.Frame(self.cnt)
+    hw = self.hw > 0 and not self.anim.Forced()
+    eye = self.anim.cur if hw else col
+    if eye != self.eye:
+      self.eye = eye
+      self.esent += 1
+      if hw:
+        self.bot.EyesBreath(self.anim.cycle(eye)[0], self.full / self.hz)
+      else:
+        self.bot.Eyes(col)
+    if col != self.col:
+      self.col = col
+      self.sent += 1
+      self.bot.Body(col)
 
 
   # get a smoothed estimate of battery voltage
@@ -155,14 +240,14 @@ class MpiShell(Thread):
       if self.nag == 0:
         self.bot.Beep(0, 1)            # for 2023 expansion board
 
-    # read voltage once every 2 seconds (60 cycles at 30 Hz)
+    # use newest reported voltage at most every 2 seconds (60 cycles at 30 Hz)
     self.vchk += 1
-    if self.vchk < 60:                
+    if self.vchk < 60 or self.vnew <= 0.0:                
       return
 
     # make sure sample not crazy (often!)
     self.vchk = 0
-    v = self.bot.Voltage() 
+    v, self.vnew = self.vnew, 0.0
     with self.lock:
   
       # if sample not crazy (often!) add to IIR filter 
@@ -177,13 +262,21 @@ class MpiShell(Thread):
       # if less than 10% left start beep                           
       if self.vest > self.v10 + 0.2:                   
         self.vhys = 0
+        self.anim.Low(False)
       elif self.vhys > 0 or self.vest < self.v10:  
         self.vhys = 1   
+        self.anim.Low(True)
         PlaySFX("beep2", 0, 1)
         self.bot.Beep(1, 1)            # backup beep (200 ms)
         self.nag = 4                    
 
 
+  # remember latest battery report (called from serial receive thread)
+
+  def vsample(self, v):
+    self.vnew = v
+
+
   # -----------------------------------------------------------------------
 
   # define basic color for pulsing (e.g. for mood)
@@ -199,39 +292,36 @@ class MpiShell(Thread):
       g /= top
       r /= top
     with self.lock:
-      if self.pend >= 0:
-        if self.rmth2 == r and self.gmth2 == g and self.bmth2 == b:
-          return
-      self.rmth2 = r
-      self.gmth2 = g 
-      self.bmth2 = b 
-      self.pend = 1
+      if self.anim.mood != (r, g, b):
+        self.anim.Breath((r, g, b))
 
 
   # immediately set LEDs to white (e.g. for surprise)
 
   def Flash(self, doit):
-    col = 0xFAFF80           # special - not used externally
-    if doit > 0:
-      self.Talk(col)
-    else:
-      with self.lock:
-        if self.force == col:
-          self.force = -1
+    self.layer('flash', 0xFAFF80 if doit > 0 else -1)
+
 
+  # show listening glow (green) unless talking or flashing
 
-  # directly set LEDs to some pre-corrected R:G:B value
+  def Listen(self, doit):
+    self.layer('listen', 0x80FF00 if doit > 0 else -1)
+
+
+  # directly set LEDs to some pre-corrected R:G:B value (-1 to release)
 
   def Talk(self, col):  
+    self.layer('talk', col)
+
+
+  # change some override layer and show result right away
+
+  def layer(self, name, col):
     with self.lock:
-      if col < 0:
-        self.force = -1
+      if self.anim.over.get(name, -1) == col:
         return
-      if col == self.force:
-        return
-      self.force = col  
-      self.bot.Eyes(col)
-      self.bot.Body(col) 
+      self.anim.Set(name, col)
+      self.emit()
 
 
   # report current battery voltage
@@ -251,6 +341,14 @@ class MpiShell(Thread):
     Thread.join(self, None)
 
 
+  # print how many LED frames actually had to be sent
+
+  def Report(self):
+    print("LEDs: %d of %d frames sent (%3.1f%%), %d eye updates%s, %d breathing colors"
+          % (self.sent, self.ticks, 100.0 * self.sent / max(1, self.ticks), self.esent,
+             " (hardware breathing)" if self.hw > 0 else "", len(self.anim.frames)))
+
+
 # =========================================================================
 
 # simple test runs breathing cycle
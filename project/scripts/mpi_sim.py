@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# mpi_sim.py : hardware-free stand-in for MasterPi robot interface
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import time, struct, sys, threading
+from math import radians, degrees, cos, sin
+from threading import Lock, Thread
+
+from mpi_hiwonder import MasterPi, SendCache
+from mpi_arm import MpiArm             # for benchmark
+from mpi_base import MpiBase           # for benchmark
+from mpi_shell import MpiShell         # for benchmark
+from mpi_sonar import MpiSonar         # for benchmark
+from cycle_prof import CycleProf       # for benchmark
+from rate_sched import RateSched       # for benchmark
+
+
+# -------------------------------------------------------------------------
+
+# optionally run all time-based code faster than real-time
+# scales time(), monotonic(), perf_counter() and sleep() by same factor
+# also shortens Condition.wait timeouts (so Event.wait and Queue.get too)
+# must be called before any component records a start time
+# Note: does not affect "from time import ..." bindings, Lock.acquire
+#       timeouts, or select() so code under test must avoid these
+
+def WarpTime(factor):
+  if factor <= 1.0:
+    return
+  real_time, real_mono, real_perf = time.time, time.monotonic, time.perf_counter
+  real_sleep = time.sleep
+  t0, m0, p0 = real_time(), real_mono(), real_perf()
+  time.time = lambda: t0 + factor * (real_time() - t0)
+  time.monotonic = lambda: m0 + factor * (real_mono() - m0)
+  time.perf_counter = lambda: p0 + factor * (real_perf() - p0)
+  time.sleep = lambda secs: real_sleep(max(0.0, secs) / factor)
+  real_wait = threading.Condition.wait
+  threading.Condition.wait = lambda self, timeout=None: \
+    real_wait(self, None if timeout is None else max(0.0, timeout) / factor)
+
+
+# -------------------------------------------------------------------------
+
+# simulated expansion board with same calls MasterPi makes on Board
+# servos ramp linearly over commanded duration, wheels lag commands
+
+class SimBoard:
+
+  # initialize state
+  def __init__(self, mv =8000):
+    self.lock = Lock()
+    self.enable_recv = False
+
+    # servo id -> (start pulse, goal pulse, start time, duration)
+    self.servo = {}
+
+    # wheel duty commands and actual (lagged) duties
+    self.duty = [0.0, 0.0, 0.0, 0.0]
+    self.wheel = [0.0, 0.0, 0.0, 0.0]
+    self.tau = 0.1                     # wheel response (secs)
+
+    # body pose in start frame (inches, degs) and time of last update
+    self.x, self.y, self.hd = 0.0, 0.0, 90.0
+    self.tw = time.time()
+
+    # LEDs, buzzer, and battery
+    self.rgb = {}
+    self.buzz = 0
+    self.mv0 = mv
+    self.t0 = time.time()
+
+    # packet counts for load testing
+    self.sent = 0
+
+    # report subscribers (battery sent once a second like real board)
+    self.subs = {}
+    self.reporter = None
+
+
+  # -----------------------------------------------------------------------
+
+  # same as Board
+
+  def enable_reception(self, enable =True):
+    self.enable_recv = enable
+
+
+  # battery slowly drains from full (mV)
+
+  def get_battery(self):
+    if not self.enable_recv:
+      return None
+    return int(self.mv0 - 0.1 * (time.time() - self.t0))
+
+
+  # have fn(data, time, seq) called on each new report of some channel
+
+  def subscribe(self, name, fn):
+    self.subs.setdefault(name, []).append(fn)
+    if name == 'battery' and self.reporter is None:
+      self.reporter = Thread(target=self.report, daemon=True)
+      self.reporter.start()
+
+
+  # periodically send battery reports to subscribers
+
+  def report(self):
+    seq = 0
+    while True:
+      time.sleep(1.0)
+      mv = self.get_battery()
+      if mv is None:
+        continue
+      seq += 1
+      data = bytes([0x04]) + struct.pack('<H', mv)
+      for fn in self.subs.get('battery', []):
+        fn(data, time.monotonic(), seq)
+
+
+  # set new pulse width goals for servos with a ramp time (secs)
+
+  def pwm_servo_set_position(self, duration, positions):
+    now = time.time()
+    with self.lock:
+      self.sent += 1
+      for sid, pw in positions:
+        self.servo[sid] = (self.Pulse(sid, now), pw, now, max(0.0, duration))
+
+
+  # native offsets are ignored
+
+  def pwm_servo_set_offset(self, servo_id, offset):
+    self.sent += 1
+
+
+  # wheel duties (-100 to 100) for motors 1-4
+
+  def set_motor_duty(self, dutys, urgent =False):
+    self.Wheels()
+    with self.lock:
+      self.sent += 1
+      for m, d in dutys:
+        self.duty[int(m) - 1] = float(d)
+
+
+  # backboard LED colors
+
+  def set_rgb(self, pixels):
+    with self.lock:
+      self.sent += 1
+      for index, r, g, b in pixels:
+        self.rgb[index] = (r, g, b)
+
+
+  # buzzer just remembered
+
+  def set_buzzer(self, freq, on_time, off_time, repeat =1):
+    self.sent += 1
+    self.buzz = freq if on_time > 0 else 0
+
+
+  # only packet count is tracked (same keys as real board)
+
+  def link_stats(self):
+    dt = max(1e-6, time.time() - self.t0)
+    st = dict.fromkeys(('bytes_in', 'frames_in', 'bytes_out', 'writes', 'crc_fails', 'resyncs', 'junk',
+                        'rx_errors', 'tx_errors', 'superseded', 'in_bps', 'out_bps', 'in_fps',
+                        'lat_avg', 'lat_max', 'write_avg', 'write_max'), 0)
+    st.update({'secs': dt, 'frames_out': self.sent, 'out_fps': self.sent / dt,
+               'drops': {}, 'retries': {}, 'lost': {}})
+    return st
+
+
+  # commands take effect immediately so batching does nothing
+
+  def tx_batch(self):
+    pass
+
+
+  def tx_flush(self):
+    pass
+
+
+  # -----------------------------------------------------------------------
+
+  # current interpolated pulse width of some servo (1500 if never set)
+
+  def Pulse(self, sid, now =0.0):
+    if now <= 0.0:
+      now = time.time()
+    s = self.servo.get(sid)
+    if s is None:
+      return 1500
+    pw0, pw1, ts, dur = s
+    if dur <= 0.0 or now >= ts + dur:
+      return pw1
+    return pw0 + (pw1 - pw0) * (now - ts) / dur
+
+
+  # integrate wheel motion up to present moment
+  # inverts MasterPi.Mecanum to get body velocities from duties
+
+  def Wheels(self):
+    now = time.time()
+    with self.lock:
+      dt = now - self.tw
+      self.tw = now
+      if dt <= 0.0:
+        return
+      f = min(1.0, dt / self.tau)
+      for i in range(4):
+        self.wheel[i] += f * (self.duty[i] - self.wheel[i])
+      v1, v2, v3, v4 = -self.wheel[0], self.wheel[1], -self.wheel[2], self.wheel[3]
+
+      # duty to ips (4 per ips) and dps (0.135 rad factor, 126mm arms, 0.7 scrub)
+      fwd  = 0.25 * (v1 + v2 + v3 + v4) / 4.0
+      side = 0.25 * (v1 - v2 - v3 + v4) / 4.0
+      vp   = 0.25 * (-v1 + v2 - v3 + v4)
+      rot  = 0.7 * degrees(vp / 126.0) / 0.135
+
+      # move in world frame (heading 90 = start forward)
+      self.hd += rot * dt
+      h = radians(self.hd)
+      self.x += (fwd * cos(h) + side * sin(h)) * dt
+      self.y += (fwd * sin(h) - side * cos(h)) * dt
+
+
+# -------------------------------------------------------------------------
+
+# simulated ultrasonic sensor facing a wall some distance ahead
+
+class SimSonar:
+
+  # initialize state (wall distance in mm along start heading)
+  def __init__(self, board, wall =1000.0):
+    self.bd = board
+    self.wall = wall
+    self.Pixels = [0, 0]
+    self.RGBMode = 0
+    self.shown = None
+    self.writes = 0
+    self.skipped = 0
+    self.errors = 0
+
+
+  def setRGBMode(self, mode):
+    self.RGBMode = mode
+    self.shown = None
+    self.writes += 1
+
+
+  # colors only count as written when changed (like real driver)
+
+  def show(self):
+    if self.Pixels == self.shown:
+      self.skipped += 1
+      return
+    self.shown = list(self.Pixels)
+    self.writes += 1
+
+
+  def setPixelColor(self, index, rgb):
+    if index == 0 or index == 1:
+      self.Pixels[index] = (rgb[0] << 16) | (rgb[1] << 8) | rgb[2]
+
+
+  def setBreathing(self, rgb, cycle):
+    self.writes += 6                   # cycle registers one at a time
+    self.setRGBMode(1)
+    self.setPixelColor(0, rgb)
+    self.setPixelColor(1, rgb)
+    self.show()
+
+
+  def i2c_stats(self):
+    return {'ops': {'rgb': {'calls': self.writes, 'avg': 0.0, 'max': 0.0}},
+            'skipped': self.skipped, 'errors': self.errors}
+
+
+  # range (mm) to wall ahead given simulated travel
+
+  def getDistance(self):
+    self.bd.Wheels()
+    d = self.wall - 25.4 * self.bd.y
+    return int(max(20, min(d, 5000)))
+
+
+# -------------------------------------------------------------------------
+
+# hardware-free stand-in for MasterPi robot interface
+# inherits all calibration, pose, and mecanum math from MasterPi
+
+class SimPi(MasterPi):
+
+  # initialize components and state (no serial port or I2C needed)
+  def __init__(self, grab =1, wall =1000.0):
+    self.out = SendCache()
+    self.shared = False
+    self.guard_init()
+    self.bd = SimBoard()
+    self.bd.enable_reception()
+    self.Freeze()
+    self.sn = SimSonar(self.bd, wall)
+    self.sn.setRGBMode(0)
+
+    # initialize state
+    self.boff, self.soff, self.eoff, self.woff, self.goff = 0, 0, 0, 0, 0
+    self.bsc, self.ssc, self.esc, self.wsc, self.gsc = 11.5, 11.5, 11.5, 11.5, 13.1
+
+    # all LEDs off at beginning
+    self.Body(0)
+    self.Eyes(0)
+
+
+  # report simulated body pose: x, y (in) and heading (deg)
+
+  def Truth(self):
+    self.bd.Wheels()
+    return self.bd.x, self.bd.y, self.bd.hd
+
+
+  # report current simulated joint angles (deg) in MasterPi.Pose order
+  # b = base, s = shoulder, e = elbow, w = wrist, g = gripper
+
+  def Angles(self):
+    now = time.time()
+    ang = []
+    for jt in (6, 5, 4, 3, 1):
+      off, sc = self.GetCal(jt)
+      ang.append((self.bd.Pulse(jt, now) - 1500 - off) / sc)
+    return tuple(ang)
+
+
+# -------------------------------------------------------------------------
+
+# headless load test of arm, base, LED shell, and sonar on simulated board
+# runs the same 30 Hz arm / base and 10 Hz body schedule as main program
+# base drives a square while arm sweeps its gaze and LEDs change color
+# Note: cameras, reasoner, face, and speech need the robot's own libraries
+#       so their cost is not included here (all times are simulated secs)
+
+def SimBench(secs =60.0):
+  bot = SimPi()
+  shell = MpiShell(bot)
+  sonar = MpiSonar(bot)
+  arm = MpiArm(bot, 0)
+  arm.Startup()
+  base = MpiBase(bot)
+  sched = RateSched()
+  sched.Add('arm',  30, 'catch')
+  sched.Add('base', 30, 'catch')
+  sched.Add('body', 10, 'skip')
+  arm.Rate(30)
+  prof = CycleProf(1.0 / 30)
+
+  # alternate 12" legs and 90 degree turns
+  base.Update()
+  mgoal, tgoal, _, _ = base.Odom()
+  legs = 0
+  end = time.monotonic() + secs
+  while time.monotonic() < end:
+    prof.Begin()
+    wait = sched.Wait()
+    if wait > 0:
+      prof.Add('sleep', wait)
+    elif wait < 0:
+      prof.Overrun(-wait)
+    t = prof.Now()
+    if sched.Due('base'):
+      base.Update()
+      trav, wind, _, _ = base.Odom()
+      if abs(trav - mgoal) < 0.5 and abs(wind - tgoal) < 2.0:
+        legs += 1
+        if legs & 1:
+          mgoal += 12.0
+        else:
+          tgoal += 90.0
+      base.Drive(mgoal, tgoal, 1.0, 1.0)
+    t = prof.Lap('base', t)
+    if sched.Due('arm'):
+      ph = 2.0 * (sched.now % 4.0) - 4.0
+      arm.LookAt(4.0 * ph, 18.0, 2.0)
+      arm.Issue()
+    t = prof.Lap('arm', t)
+    if sched.Due('body'):
+      shell.Breath((0xFF0000, 0x00FF00, 0x0000FF)[legs % 3])
+      shell.Talk(0xFFFFFF if (int(sched.now) & 1) else -1)
+    prof.Lap('body', t)
+
+  # stop everything and summarize
+  base.Stop()
+  bot.Freeze()
+  shell.Done()
+  sonar.Done()
+  print("Drove %d legs, now at (%4.1f %4.1f) @ %3.0f" % ((legs,) + bot.Truth()))
+  prof.Report(('base', 'arm', 'body'))
+  sched.Report()
+  bot.out.Report()
+  shell.Report()
+  bot.LinkReport()
+  sonar.Report()
+
+
+# =========================================================================
+
+# simple test drives forward while posing arm (10x real-time)
+# "python mpi_sim.py bench [warp] [secs]" runs SimBench instead
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+    WarpTime(float(sys.argv[2]) if len(sys.argv) > 2 else 10.0)
+    SimBench(float(sys.argv[3]) if len(sys.argv) > 3 else 60.0)
+    sys.exit(0)
+  WarpTime(10.0)
+  bot = SimPi()
+  bot.LoadCal()
+  bot.Pose(20, -10, 30, -20, 5, 1.0)
+  bot.Mecanum(8, 0, 0)
+  t0 = time.time()
+  for i in range(10):
+    time.sleep(0.2)
+    x, y, h = bot.Truth()
+    b, s, e, w, g = bot.Angles()
+    print("t = %3.1f: pos (%4.1f %4.1f) @ %3.0f, sonar %4.1f\", base %4.1f, shoulder %4.1f"
+          % (time.time() - t0, x, y, h, bot.Prox(), b, s))
+  bot.Freeze()
+  print("Battery = %4.2fv, packets = %d" % (bot.Voltage(), bot.bd.sent))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# mpi_sonar.py : filtered front range from MasterPi ultrasonic sensor
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import time
+
+from threading import Thread, Event, Lock
+
+from mpi_hiwonder import MasterPi      # for testing
+
+
+# -------------------------------------------------------------------------
+
+# background thread reads sonar at its own rate so callers never wait
+# median of last few good readings suppresses single echo glitches
+# a reading far from median must be confirmed by the next one to count
+# bus errors (99999) are discarded, max range (5000) means nothing ahead
+
+class MpiSonar(Thread):
+
+  # initialize state (takes robot interface object as argument)
+  def __init__(self, mpi, hz =20.0, size =5, gate =150.0):
+    super(MpiSonar, self).__init__(daemon=True)
+    self.halt = Event()
+    self.lock = Lock()
+    self.sn = mpi.sn
+
+    # sampling and filter parameters
+    self.wait = 1.0 / hz
+    self.size = size                   # median window (readings)
+    self.gate = gate                   # outlier distance from median (mm)
+    self.stale = 5.0 * self.wait       # result invalid if no reading this long
+
+    # recent accepted readings (mm) and one pending jump
+    self.win = []
+    self.jump = None
+
+    # filtered range (mm) and time of newest accepted reading
+    self.mm = 5000.0
+    self.t = 0.0
+
+    # statistics
+    self.n = 0
+    self.errs = 0
+    self.outliers = 0
+    self.t0 = 0.0
+
+    # start background thread
+    self.start()
+
+
+  # -----------------------------------------------------------------------
+
+  # override Thread.run() which is called by start()
+
+  def run(self):
+    self.t0 = time.monotonic()
+    due = self.t0
+    while not self.halt.is_set():
+      self.sample(self.sn.getDistance(), time.monotonic())
+      due = max(due + self.wait, time.monotonic())
+      self.halt.wait(due - time.monotonic())
+
+
+  # fold one raw reading (mm) taken at time t into filtered estimate
+
+  def sample(self, d, t):
+    with self.lock:
+      self.n += 1
+      if d > 5000:
+        self.errs += 1
+        return
+      if self.win:
+        med = self.median()
+        if abs(d - med) > self.gate:
+          if self.jump is None or abs(d - self.jump) > self.gate:
+            self.jump = d                # wait for confirmation
+            self.outliers += 1
+            return
+          self.win = [self.jump]         # real change so restart window
+      self.jump = None
+      self.win.append(d)
+      if len(self.win) > self.size:
+        self.win.pop(0)
+      self.mm = self.median()
+      self.t = t
+
+
+  # middle value of current window
+
+  def median(self):
+    s = sorted(self.win)
+    return 0.5 * (s[(len(s) - 1) // 2] + s[len(s) // 2])
+
+
+  # -----------------------------------------------------------------------
+
+  # filtered range (in) ahead, never waits for sensor
+  # value is only meaningful if Valid() is true
+
+  def Prox(self):
+    return self.mm / 25.4
+
+
+  # whether filtered range is based on recent good readings
+
+  def Valid(self):
+    return self.t > 0.0 and (time.monotonic() - self.t) < self.stale
+
+
+  # filtered range (in), time of newest reading, and validity all together
+
+  def Range(self):
+    with self.lock:
+      return self.mm / 25.4, self.t, self.Valid()
+
+
+  # stop background sampling
+
+  def Done(self):
+    self.halt.set()
+    Thread.join(self, None)
+
+
+  # print sample rate and rejected readings
+
+  def Report(self):
+    dt = max(1e-6, time.monotonic() - self.t0)
+    print("Sonar: %d readings at %3.1f Hz, %d errors, %d outliers, range %3.1f\"%s"
+          % (self.n, self.n / dt, self.errs, self.outliers, self.Prox(), "" if self.Valid() else " (stale)"))
+
+
+# =========================================================================
+
+# simple test prints filtered range for 10 seconds
+
+if __name__ == "__main__":
+  bot = MasterPi()
+  sonar = MpiSonar(bot)
+  for i in range(20):
+    time.sleep(0.5)
+    print("%s %4.1f\"" % ("ok" if sonar.Valid() else "--", sonar.Prox()))
+  sonar.Done()
+  sonar.Report()
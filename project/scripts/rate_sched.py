@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# =========================================================================
+#
+# rate_sched.py : drift-free multi-rate task scheduler for control loops
+#
+# Written by Jonathan H. Connell, jconnell@alum.mit.edu
+#
+# =========================================================================
+#
+# Copyright 2026 Etaoin Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# =========================================================================
+
+import time
+
+
+# -------------------------------------------------------------------------
+
+# one periodic activity with its own deadline grid and overrun policy
+#   catch   = run again right away for each missed period (up to "most")
+#   skip    = drop missed periods but stay on original time grid
+#   degrade = stretch period when late (down to "slow" Hz) then recover
+
+class RateTask:
+
+  # initialize state (rates in Hz)
+  def __init__(self, name, hz, policy ='catch', slow =0.0, most =3):
+    self.name   = name
+    self.policy = policy
+    self.nom    = 1.0 / hz
+    self.top    = 1.0 / slow if slow > 0.0 else self.nom
+    self.most   = most
+    self.period = self.nom
+    self.next   = 0.0
+
+    # statistics
+    self.runs = 0
+    self.late = 0
+    self.miss = 0
+
+
+  # tell current effective rate (Hz)
+
+  def Rate(self):
+    return 1.0 / self.period
+
+
+  # decide whether task should run at given time and advance deadline
+  # returns True if task is due
+
+  def Due(self, now):
+    if self.next <= 0.0:
+      self.next = now
+    if now < self.next:
+      return False
+    self.runs += 1
+
+    # on time (within one period) so just step grid
+    behind = int((now - self.next) / self.period)
+    if behind <= 0:
+      if self.policy == 'degrade' and self.period > self.nom:
+        self.period = max(self.nom, 0.9 * self.period)
+      self.next += self.period
+      return True
+    self.late += 1
+
+    # fallen behind by one or more full periods
+    if self.policy == 'catch' and behind <= self.most:
+      self.next += self.period         # backlog runs next passes
+    elif self.policy == 'degrade':
+      self.period = min(1.25 * self.period, self.top)
+      self.next = now + self.period
+    else:
+      self.miss += behind
+      self.next += (behind + 1) * self.period
+    return True
+
+
+# -------------------------------------------------------------------------
+
+# drift-free multi-rate task scheduler for control loops
+# all deadlines live on a monotonic clock and advance by whole periods
+
+class RateSched:
+
+  # initialize state
+  def __init__(self):
+    self.tasks = {}
+    self.now = 0.0
+
+
+  # add or reconfigure a named task (rates in Hz)
+
+  def Add(self, name, hz, policy ='catch', slow =0.0, most =3):
+    self.tasks[name] = RateTask(name, hz, policy, slow, most)
+
+
+  # tell whether named task should be run during this pass
+  # unknown tasks are always due
+
+  def Due(self, name):
+    tk = self.tasks.get(name)
+    if tk is None:
+      return True
+    return tk.Due(self.now)
+
+
+  # tell current effective rate (Hz) of some task
+
+  def Rate(self, name):
+    tk = self.tasks.get(name)
+    if tk is None:
+      return 0.0
+    return tk.Rate()
+
+
+  # sleep until earliest task deadline then latch time for this pass
+  # returns time slept (secs) or negative amount late if behind
+
+  def Wait(self):
+    now = time.monotonic()
+    due = min((tk.next for tk in self.tasks.values() if tk.next > 0.0), default=now)
+    wait = due - now
+    if wait > 0.0:
+      time.sleep(wait)
+      now = time.monotonic()
+    self.now = now
+    return wait
+
+
+  # print run counts, late passes, and dropped periods for all tasks
+
+  def Report(self):
+    if not self.tasks:
+      return
+    print("Task rates (runs / late / skipped):")
+    for tk in self.tasks.values():
+      print("  %-12s %5.1f Hz %7d %6d %6d" % (tk.name, tk.Rate(), tk.runs, tk.late, tk.miss))